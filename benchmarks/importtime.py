@@ -0,0 +1,77 @@
+"""Cold start of the app: import time, and what the first request adds.
+
+Imports --module in fresh interpreters and takes the median over --runs of
+- import_ms: wall time of the import, which creates the app (core.server:app),
+- blueprints_ms: registering the blueprints, which the first request does.
+One more run under `python -X importtime` lists the top-level packages with the
+most import time of their own. Exits with status 1 when import_ms exceeds
+--budget-ms, so a change that makes startup import something heavy fails it.
+
+    python -m benchmarks.importtime --runs 5 --budget-ms 600
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+from {module} import app
+imported = time.perf_counter()
+app.load_blueprints()
+print(json.dumps({{'import_ms': (imported - started) * 1000, 'blueprints_ms': (time.perf_counter() - imported) * 1000}}))
+"""
+
+
+def measure(module):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(module=module)], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def self_time_by_package(module):
+    """{top-level package: ms} of the import, from the `-X importtime` lines ("import time: self | cumulative | name")"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module], check=True, capture_output=True, text=True
+    ).stderr
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1000
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='core.server', help='module whose `app` is imported')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='packages listed')
+    parser.add_argument('--budget-ms', type=float, default=600, help='median import time allowed')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    result = {
+        'module': args.module,
+        'import_ms': round(statistics.median(run['import_ms'] for run in runs), 1),
+        'blueprints_ms': round(statistics.median(run['blueprints_ms'] for run in runs), 1),
+        'budget_ms': args.budget_ms,
+        'top_packages_ms': {
+            package: round(ms, 1) for package, ms in self_time_by_package(args.module).most_common(args.top)
+        },
+    }
+    print(json.dumps(result))
+
+    if result['import_ms'] > args.budget_ms:
+        sys.exit('import of {0} took {1} ms, over the budget of {2} ms'.format(
+            args.module, result['import_ms'], args.budget_ms
+        ))
+
+
+if __name__ == '__main__':
+    main()
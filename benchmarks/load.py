@@ -0,0 +1,205 @@
+"""HTTP load test of core.server:app under waitress or gunicorn, or of core.asgi:app under uvicorn.
+
+Starts the server on a scratch copy of the database (migrated and seeded like
+the test database unless --database is given), replays a weighted mix of
+student, teacher and principal calls from --concurrency client threads, and
+prints requests per second, latency percentiles and error rates as JSON.
+
+    python -m benchmarks.load --server gunicorn --workers 4 --worker-class sync --seconds 10
+    python -m benchmarks.load --server waitress --threads 8 --mix student_assignments=1,principal_teachers=1
+    python -m benchmarks.load --server uvicorn --workers 1 --concurrency 32
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# X-Principal headers of the seeded users, the same as tests/conftest.py
+STUDENTS = [{'student_id': 1, 'user_id': 1}, {'student_id': 2, 'user_id': 2}]
+TEACHERS = [{'teacher_id': 1, 'user_id': 3}, {'teacher_id': 2, 'user_id': 4}]
+PRINCIPALS = [{'principal_id': 1, 'user_id': 5}]
+
+# call name -> (method, path, principals, body)
+CALLS = {
+    'student_assignments': ('GET', '/student/assignments', STUDENTS, None),
+    'student_upsert': ('POST', '/student/assignments', STUDENTS, {'content': 'load test'}),
+    'teacher_assignments': ('GET', '/teacher/assignments', TEACHERS, None),
+    'principal_assignments': ('GET', '/principal/assignments', PRINCIPALS, None),
+    'principal_teachers': ('GET', '/principal/teachers', PRINCIPALS, None),
+    'principal_report': ('GET', '/principal/reports/graded-assignments', PRINCIPALS, None),
+}
+DEFAULT_MIX = 'student_assignments=4,teacher_assignments=3,principal_assignments=2,principal_teachers=1'
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        if name not in CALLS:
+            raise argparse.ArgumentTypeError('unknown call {0!r}, expected one of {1}'.format(name, ', '.join(CALLS)))
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def prepare_database(tmp, database):
+    path = os.path.join(tmp, 'load.sqlite3')
+    if database:
+        shutil.copyfile(database, path)
+        return path
+
+    env = dict(os.environ, FLASK_APP='core/server.py', DATABASE_URL='sqlite:///' + path)
+    subprocess.run(['flask', 'db', 'upgrade', '-d', 'core/migrations/'], env=env, check=True, capture_output=True)
+    return path
+
+
+def server_command(args):
+    address = '127.0.0.1:{0}'.format(args.port)
+    if args.server == 'waitress':
+        return ['waitress-serve', '--listen=' + address, '--threads={0}'.format(args.threads), 'core.server:app']
+    if args.server == 'uvicorn':
+        return [
+            'uvicorn', '--host', '127.0.0.1', '--port', str(args.port), '--workers', str(args.workers),
+            '--no-access-log', 'core.asgi:app'
+        ]
+    return [
+        'gunicorn', '--bind', address, '--workers', str(args.workers), '--worker-class', args.worker_class,
+        '--threads', str(args.threads), 'core.server:app'
+    ]
+
+
+def wait_until_ready(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited with {0}'.format(process.returncode))
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not answer within {0}s'.format(timeout))
+
+
+def client(port, weights, deadline, seed, results):
+    rng = random.Random(seed)
+    names, call_weights = list(weights), list(weights.values())
+
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    samples = []
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights=call_weights)[0]
+        method, path, principals, body = CALLS[name]
+        headers = {'X-Principal': json.dumps(rng.choice(principals)), 'Content-Type': 'application/json'}
+
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            ok = False
+        samples.append((name, time.perf_counter() - started, ok))
+    connection.close()
+    results.extend(samples)
+
+
+def run_clients(port, weights, seconds, concurrency, seed):
+    samples = []
+    deadline = time.monotonic() + seconds
+    threads = [
+        threading.Thread(target=client, args=(port, weights, deadline, seed + i, samples))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile_ms(cut_points, p):
+    return round(cut_points[p - 1] * 1000, 2)
+
+
+def report(samples, seconds):
+    latencies = [latency for _, latency, _ in samples]
+    cut_points = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    errors = sum(1 for _, _, ok in samples if not ok)
+
+    calls = {}
+    for name, _, ok in samples:
+        counts = calls.setdefault(name, {'requests': 0, 'errors': 0})
+        counts['requests'] += 1
+        counts['errors'] += not ok
+
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / seconds, 1),
+        'p50_ms': percentile_ms(cut_points, 50),
+        'p95_ms': percentile_ms(cut_points, 95),
+        'p99_ms': percentile_ms(cut_points, 99),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'calls': calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['waitress', 'gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn or uvicorn worker processes')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class, e.g. sync, gthread, gevent')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker, or waitress threads')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=1, help='seconds of load before measuring')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='call=weight,... from ' + ', '.join(CALLS))
+    parser.add_argument('--database', help='SQLite file to copy and serve instead of the migrated test data')
+    parser.add_argument('--port', type=int, default=7799)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + prepare_database(tmp, args.database), LOG_ACCESS_SAMPLE_RATE='0')
+        with open(os.path.join(tmp, 'server.log'), 'w+') as log:
+            process = subprocess.Popen(server_command(args), env=env, stdout=subprocess.DEVNULL, stderr=log)
+            try:
+                try:
+                    wait_until_ready(args.port, process)
+                except RuntimeError:
+                    log.seek(0)
+                    sys.stderr.write(log.read())
+                    raise
+
+                run_clients(args.port, args.mix, args.warmup, args.concurrency, args.seed)
+                samples = run_clients(args.port, args.mix, args.seconds, args.concurrency, args.seed)
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(json.dumps({
+        'server': args.server,
+        'workers': args.workers if args.server != 'waitress' else 1,
+        'worker_class': args.worker_class if args.server == 'gunicorn' else args.server,
+        'threads': args.threads,
+        'concurrency': args.concurrency,
+        'seconds': args.seconds,
+        **report(samples, args.seconds),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Startup time and memory of gunicorn workers, development vs production profile.
+
+Starts gunicorn with gunicorn_config.py under each GUNICORN_PROFILE with the
+same number of workers, times how long it takes until every worker is ready to
+serve, sends requests for --seconds, then reads /proc/<pid>/smaps_rollup of the
+master and the workers. `shared` is what a worker shares with the others
+(copy-on-write pages of the preloaded master among them), `private` what it
+holds alone. Linux only.
+
+    python -m benchmarks.prefork --workers 4 --seconds 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from . import load
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def memory_kb(pid):
+    fields = {}
+    with open('/proc/{0}/smaps_rollup'.format(pid)) as smaps:
+        for line in smaps:
+            name, _, value = line.partition(':')
+            if name in SMAPS_FIELDS:
+                fields[name] = int(value.split()[0])
+    return fields
+
+
+def children(pid):
+    pids = []
+    for task in os.listdir('/proc/{0}/task'.format(pid)):
+        with open('/proc/{0}/task/{1}/children'.format(pid, task)) as listing:
+            pids.extend(int(child) for child in listing.read().split())
+    return pids
+
+
+def wait_for_workers(log_path, workers, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited with {0}'.format(process.returncode))
+        with open(log_path) as log:
+            if log.read().count('Worker ready') >= workers:
+                return
+        time.sleep(0.01)
+    raise RuntimeError('workers were not ready within {0}s'.format(timeout))
+
+
+def measure(profile, args, database):
+    env = dict(
+        os.environ, GUNICORN_PROFILE=profile, GUNICORN_NUMBER_WORKERS=str(args.workers),
+        GUNICORN_NUMBER_WORKER_THREADS='1', DATABASE_URL='sqlite:///' + database, LOG_ACCESS_SAMPLE_RATE='0'
+    )
+    command = ['gunicorn', '-c', 'gunicorn_config.py', '--bind', '127.0.0.1:{0}'.format(args.port), 'core.server:app']
+
+    with tempfile.NamedTemporaryFile('w+', suffix='.log') as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            try:
+                wait_for_workers(log.name, args.workers, process)
+            except RuntimeError:
+                log.seek(0)
+                sys.stderr.write(log.read())
+                raise
+            startup = time.perf_counter() - started
+
+            # requests from one client per worker, so the workers touch what serving touches
+            weights = load.parse_mix(load.DEFAULT_MIX)
+            load.run_clients(args.port, weights, args.seconds, args.workers, args.seed)
+
+            master = memory_kb(process.pid)
+            workers = [memory_kb(pid) for pid in children(process.pid)]
+        finally:
+            process.terminate()
+            process.wait()
+
+    def per_worker(*names):
+        return round(sum(sum(worker[name] for name in names) for worker in workers) / len(workers) / 1024, 1)
+
+    return {
+        'profile': profile,
+        'workers': len(workers),
+        'startup_s': round(startup, 2),
+        'worker_rss_mb': per_worker('Rss'),
+        'worker_shared_mb': per_worker('Shared_Clean', 'Shared_Dirty'),
+        'worker_private_mb': per_worker('Private_Clean', 'Private_Dirty'),
+        'total_pss_mb': round((master['Pss'] + sum(worker['Pss'] for worker in workers)) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=2, help='seconds of requests before reading the memory')
+    parser.add_argument('--database', help='SQLite file to copy and serve instead of the migrated test data')
+    parser.add_argument('--port', type=int, default=7798)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = load.prepare_database(tmp, args.database)
+        for profile in ('development', 'production'):
+            print(json.dumps(measure(profile, args, database)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Compiled serializers vs marshmallow dump on in-memory assignments.
+
+    python -m benchmarks.serializers --rows 1000 10000 100000
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timezone
+
+from core.apis.assignments.schema import AssignmentSchema, assignment_serializer
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+
+
+def make_assignments(rows):
+    now = datetime.now(timezone.utc)
+    return [
+        Assignment(
+            id=i, student_id=i % 100, teacher_id=i % 10, content='content {0}'.format(i),
+            grade=GradeEnum.A, state=AssignmentStateEnum.GRADED, created_at=now, updated_at=now
+        )
+        for i in range(rows)
+    ]
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        assignments = make_assignments(rows)
+        marshmallow_seconds = best_of(lambda: AssignmentSchema().dump(assignments, many=True), args.repeat)
+        compiled_seconds = best_of(lambda: assignment_serializer.dump(assignments, many=True), args.repeat)
+        print(json.dumps({
+            'rows': rows,
+            'marshmallow_ms': round(marshmallow_seconds * 1000, 1),
+            'compiled_ms': round(compiled_seconds * 1000, 1),
+            'speedup': round(marshmallow_seconds / compiled_seconds, 1),
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Concurrent read/write throughput of the SQLite connection profiles.
+
+Starts reader and writer processes (like gunicorn workers) against a scratch
+database and counts completed operations and "database is locked" errors.
+
+    python -m benchmarks.sqlite_concurrency --readers 4 --writers 2 --seconds 5
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from core import db
+from core.libs import sqlite
+from core.libs.helpers import get_utc_now
+from core.models import assignments, principals, users  # noqa: F401 registers the tables on db.metadata
+
+READ_SQL = text(
+    'SELECT * FROM assignments WHERE student_id = :student_id ORDER BY updated_at, id LIMIT 100'
+)
+INSERT_SQL = text(
+    "INSERT INTO assignments (student_id, content, state, created_at, updated_at) "
+    "VALUES (:student_id, 'benchmark', 'DRAFT', :now, :now)"
+)
+UPDATE_SQL = text(
+    "UPDATE assignments SET content = 'benchmark edited', updated_at = :now WHERE id = :id"
+)
+
+
+def make_engine(path, profile):
+    engine = create_engine('sqlite:///{0}'.format(path))
+    return sqlite.install_pragmas(engine, sqlite.get_pragmas(profile))
+
+
+def setup_database(path, profile, students=50, assignments=20000):
+    engine = make_engine(path, profile)
+    db.metadata.create_all(engine)
+    now = get_utc_now()
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, username, email, created_at, updated_at) VALUES (1, 'u', 'u@x', :now, :now)"), {'now': now})
+        connection.execute(
+            text('INSERT INTO students (id, user_id, created_at, updated_at) VALUES (:id, 1, :now, :now)'),
+            [{'id': i, 'now': now} for i in range(1, students + 1)]
+        )
+        connection.execute(INSERT_SQL, [{'student_id': i % students + 1, 'now': now} for i in range(assignments)])
+    engine.dispose()
+
+
+def worker(path, profile, role, seconds, students, results):
+    engine = make_engine(path, profile)
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    i = os.getpid()
+    while time.monotonic() < deadline:
+        i += 1
+        try:
+            if role == 'reader':
+                with engine.connect() as connection:
+                    connection.execute(READ_SQL, {'student_id': i % students + 1}).fetchall()
+            else:
+                with engine.begin() as connection:
+                    now = get_utc_now()
+                    row_id = connection.execute(INSERT_SQL, {'student_id': i % students + 1, 'now': now}).lastrowid
+                    connection.execute(UPDATE_SQL, {'id': row_id, 'now': now})
+            ops += 1
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put((role, ops, errors))
+
+
+def run(profile, readers, writers, seconds, students=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sqlite3')
+        setup_database(path, profile, students)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(path, profile, role, seconds, students, results))
+            for role in ['reader'] * readers + ['writer'] * writers
+        ]
+        for process in processes:
+            process.start()
+        totals = {'reader': [0, 0], 'writer': [0, 0]}
+        for _ in processes:
+            role, ops, errors = results.get()
+            totals[role][0] += ops
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+
+    return {
+        'profile': profile,
+        'reads_per_sec': round(totals['reader'][0] / seconds, 1),
+        'writes_per_sec': round(totals['writer'][0] / seconds, 1),
+        'read_errors': totals['reader'][1],
+        'write_errors': totals['writer'][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profiles', nargs='+', default=['default', 'production'], choices=sorted(sqlite.SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        print(json.dumps(run(profile, args.readers, args.writers, args.seconds)))
+
+
+if __name__ == '__main__':
+    main()
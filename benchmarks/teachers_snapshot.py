@@ -0,0 +1,73 @@
+"""GET /principal/teachers throughput with and without the teacher snapshot.
+
+Serves the endpoint through the Flask test client from a scratch database, so
+the numbers cover the query, the dump and the JSON encoding but not the network.
+
+    python -m benchmarks.teachers_snapshot --teachers 1000 --seconds 3
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'teachers_snapshot.sqlite3')
+
+from sqlalchemy import text  # noqa: E402
+
+from core import app, db  # noqa: E402
+from core.apis.teachers.principal import teachers_snapshot  # noqa: E402
+from core.libs.helpers import get_utc_now  # noqa: E402
+from core.models import assignments, principals, users  # noqa: E402,F401 registers the tables on db.metadata
+
+HEADERS = {'X-Principal': json.dumps({'principal_id': 1, 'user_id': 1})}
+
+
+def setup_database(teachers):
+    db.create_all()
+    now = get_utc_now()
+    with db.engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO users (id, username, email, created_at, updated_at) VALUES (:id, :name, :name, :now, :now)"),
+            [{'id': i, 'name': 'user{0}'.format(i), 'now': now} for i in range(1, teachers + 2)]
+        )
+        connection.execute(text('INSERT INTO principals (id, user_id, created_at, updated_at) VALUES (1, 1, :now, :now)'), {'now': now})
+        connection.execute(
+            text('INSERT INTO teachers (id, user_id, created_at, updated_at) VALUES (:id, :user_id, :now, :now)'),
+            [{'id': i, 'user_id': i + 1, 'now': now} for i in range(1, teachers + 1)]
+        )
+
+
+def requests_per_second(client, seconds):
+    requests = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        response = client.get('/principal/teachers', headers=HEADERS)
+        assert response.status_code == 200
+        requests += 1
+    return requests / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teachers', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    setup_database(args.teachers)
+    client = app.test_client()
+    results = {'teachers': args.teachers}
+    for label, ttl in (('without_snapshot', 0), ('with_snapshot', 60)):
+        teachers_snapshot._ttl = ttl
+        teachers_snapshot.invalidate()
+        teachers_snapshot.hits = teachers_snapshot.misses = 0
+        results[label] = {
+            'rps': round(requests_per_second(client, args.seconds), 1),
+            'hits': teachers_snapshot.hits,
+            'misses': teachers_snapshot.misses,
+        }
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,98 @@
-from flask import Flask, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
-from sqlite3 import Connection as SQLite3Connection
+import os
+from flask import jsonify
+from flask_sqlalchemy import SQLAlchemy as BaseSQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.engine import make_url
+from .config import Config
+from .libs import log, metrics, sqlite
+from .libs.lazy import LazyFlask
+from .libs.pools import pool_options
 from .libs.exceptions import FyleError
 
-app = Flask(__name__) # Initializes the Flask app
 
-# sets up the database URI to use SQLite,
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///./store.sqlite3'
-# if True, SQLAlchemy will log all the raw SQL statements
-app.config['SQLALCHEMY_ECHO'] = False
-# Disables tracking 
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+class RoutingSession(SignallingSession):
+    """Runs the statements of a session marked read-only (session.info['read_only'], see decorators.read_only)
+    on the read engine, and all the others on the primary"""
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+    def get_bind(self, mapper=None, clause=None):
+        if self.info.get('read_only'):
+            return get_state(self.app).db.get_read_engine(self.app)
+        return super().get_bind(mapper, clause)
 
-# sets test client to simulate HTTP requests for testing, allows to call endpoints during testing without running the server
-app.test_client()
 
+class SQLAlchemy(BaseSQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
 
-# this is to enforce fk (not done by default in sqlite3)
-@event.listens_for(Engine, "connect")
-def _set_sqlite_pragma(dbapi_connection, connection_record):
-    if isinstance(dbapi_connection, SQLite3Connection):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        cursor.close()
+    # pools the connections as configured by the DB_POOL_* settings, see core/config.py
+    def apply_driver_hacks(self, app, sa_url, options):
+        options = dict(options, **pool_options(app.config, sa_url))
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    # applies the configured SQLite pragmas to this app's engine only, instead of every Engine in the process,
+    # and counts its statements for /metrics
+    def create_engine(self, sa_url, engine_opts):
+        engine = metrics.install_sql_metrics(super().create_engine(sa_url, engine_opts))
+        if engine.dialect.name == 'sqlite':
+            config = self.get_app().config
+            sqlite.install_pragmas(engine, sqlite.get_pragmas(config['SQLITE_PROFILE'], config['SQLITE_PRAGMAS']))
+        return engine
+
+    def get_read_engine(self, app=None):
+        """Engine of the read-only routes: DATABASE_READ_URL (a replica) when set, else the SQLite file of the primary
+        opened read-only (mode=ro, readers never take a write lock and see every commit in WAL mode), else the primary"""
+        app = self.get_app(app)
+        primary = self.get_engine(app)
+        state = get_state(app)
+        with self._engine_lock:
+            if getattr(state, 'read_engine', None) is None:
+                config = app.config
+                if config['DATABASE_READ_URL']:
+                    url = make_url(config['DATABASE_READ_URL'])
+                elif primary.dialect.name == 'sqlite' and primary.url.database not in (None, '', ':memory:'):
+                    url = primary.url.set(database='file:' + primary.url.database, query={'mode': 'ro', 'uri': 'true'})
+                else:
+                    url = None
+                state.read_engine = self.create_engine(url, pool_options(config, url)) if url is not None else primary
+            return state.read_engine
+
+
+db = SQLAlchemy()
+
+
+def create_app(config=Config):
+    """Builds a Flask app on `config` (a class or object of settings, see core/config.py). Its blueprints are imported
+    on the first request it serves and its CLI commands when they are run, see core/libs/lazy.py.
+    The app of `gunicorn core.server:app` and `from core import app` is created by core/server.py, on Config."""
+    app = LazyFlask(__name__)
+
+    # database URI, SQLite connection profile etc., overridable from the environment (see core/config.py)
+    app.config.from_object(config)
+
+    db.init_app(app)
+
+    # `flask db ...`: Flask-Migrate imports alembic, which nothing else needs
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # per-route latency, response size, SQL and error metrics served at /metrics
+    metrics.init_app(app)
+    # JSON logs written by a background thread, X-Request-Id on every response
+    log.init_app(app)
+
+    # routes, hooks, error handler and commands of the API, imported here as they use `db` from this module
+    from .apis.hooks import init_app
+    init_app(app)
+    return app
+
+
+# `from core import app`: the default app, created on first use so that importing the models or core.libs does not
+def __getattr__(name):
+    if name == 'app':
+        from .server import app
+        return app
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
 
 
 # @app.errorhandler(FyleError)
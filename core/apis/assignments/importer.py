@@ -0,0 +1,61 @@
+from marshmallow import ValidationError
+from sqlalchemy import select
+from core import db
+from core.libs import streams
+from core.models.assignments import Assignment
+from core.models.students import Student
+from core.models.teachers import Teacher
+from .schema import AssignmentImportSchema
+
+
+def _existing_ids(connection, model, ids):
+    ids = {_id for _id in ids if _id is not None}
+    if not ids:
+        return set()
+    return set(connection.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+
+def _check_references(connection, loaded):
+    """Per row errors for the student / teacher ids of a chunk that do not exist, with one query per table"""
+    students = _existing_ids(connection, Student, (row['student_id'] for _, _, row in loaded))
+    teachers = _existing_ids(connection, Teacher, (row['teacher_id'] for _, _, row in loaded))
+
+    for number, record, row in loaded:
+        errors = {}
+        if row['student_id'] not in students:
+            errors['student_id'] = ['No student with this id was found']
+        if row['teacher_id'] is not None and row['teacher_id'] not in teachers:
+            errors['teacher_id'] = ['No teacher with this id was found']
+        yield number, record, row, errors
+
+
+def import_assignments(records, chunk_size, reject):
+    """Validates and inserts assignment records (dicts from streams.iter_records) `chunk_size` at a time, each chunk in
+    its own transaction, so memory stays flat and a failure keeps the chunks already committed.
+    reject(number, record, errors) is called for every invalid record, numbered from 1 in input order. Returns the (imported, rejected) counts."""
+    schema = AssignmentImportSchema()
+    imported = rejected = 0
+
+    for chunk in streams.batches(enumerate(records, start=1), chunk_size):
+        loaded = []
+        for number, record in chunk:
+            try:
+                loaded.append((number, record, schema.load(record)))
+            except ValidationError as err:
+                reject(number, record, err.messages)
+                rejected += 1
+
+        connection = db.session.connection()
+        rows = []
+        for number, record, row, errors in _check_references(connection, loaded):
+            if errors:
+                reject(number, record, errors)
+                rejected += 1
+            else:
+                rows.append(row)
+
+        Assignment.insert_rows(connection, rows)
+        db.session.commit()
+        imported += len(rows)
+
+    return imported, rejected
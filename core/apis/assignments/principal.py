@@ -1,27 +1,42 @@
-from flask import Blueprint
+import csv
+import io
+import logging
+from flask import Blueprint, Response, request, stream_with_context
 from core import db 
 from core.apis import decorators
-from core.apis.responses import APIResponse
+from core.apis.responses import STREAM_CHUNK_SIZE, APIResponse
 from core.models.assignments import Assignment, AssignmentStateEnum
-from .schema import AssignmentSchema, AssignmentGradeSchema
-from core.libs import assertions
+from core.config import Config
+from .importer import import_assignments
+from .schema import AssignmentSchema, AssignmentFilterSchema, AssignmentGradeSchema, assignment_serializer, dump_bulk_results
+from core.libs import assertions, pagination, sqlite, streams
 
 # principal_assignments_resources = Blueprint('principal_assignments_resources', __name__)
 principal_assignments_resources = Blueprint('principal_assignments_resources', __name__)
 
+logger = logging.getLogger(__name__)
+
 
 # Principal can retrieve all assignments.
 @principal_assignments_resources.route('/assignments', methods=['GET'], strict_slashes=False)
+@decorators.read_only
 @decorators.authenticate_principal
+@decorators.conditional(lambda p: Assignment.get_fingerprint(Assignment.query_by_principal()))
 def list_assignments_for_principal(p):
-    # assignments = Assignment.query.all()
-    assignments = Assignment.get_assignments_by_principal()
+    # streams every assignment when asked to, instead of one page
+    stream_mode = APIResponse.stream_mode()
+    if stream_mode is not None:
+        assignments = Assignment.iter_all(Assignment.query_by_principal())
+        return APIResponse.stream(assignments, assignment_serializer.dump, stream_mode)
+
+    limit, cursor = pagination.get_page_args(request.args)
+    assignments, next_cursor = Assignment.get_assignments_by_principal(limit=limit, cursor=cursor)
 
     assertions.assert_found(assignments, 'No assignments found for this principal')
 
-    assignments_dump = AssignmentSchema().dump(assignments, many=True)
-    print("assignment dump",assignments_dump)
-    return APIResponse.respond(data=assignments_dump)
+    assignments_dump = assignment_serializer.dump(assignments, many=True)
+    logger.debug('listed assignments', extra={'count': len(assignments_dump), 'next_cursor': next_cursor})
+    return APIResponse.respond(data=assignments_dump, next_cursor=next_cursor)
 
 
 @principal_assignments_resources.route('/assignments/grade', methods=['POST'], strict_slashes=False)
@@ -31,37 +46,97 @@ def grade_assignment_for_principal(p, incoming_payload):
     """Grade an assignment"""
     grade_assignment_payload = AssignmentGradeSchema().load(incoming_payload)
 
-    # Fetch the assignment by ID
-    assignment = Assignment.query.get(grade_assignment_payload.id)
-
-    # if not assignment:
-    #     return APIResponse.respond(
-    #         message='Assignment not found.',
-    #         error="FyleError",
-    #         status_code=404  
-    #     )
-
-    # Check if the assignment is in "DRAFT" state
-    # if assignment.state == AssignmentStateEnum.DRAFT:
-    #     return APIResponse.respond(
-    #         message="Assignments in draft state cannot be graded.",
-    #         error="DRAFT_STATE",
-    #         status_code=400 
-    #     )
-
-    assertions.assert_found(assignment, 'No assignments found for this principal')
-
-    assertions.assert_valid(assignment.state != AssignmentStateEnum.DRAFT,
-                            'Assignments in draft state cannot be graded')
-
-    # Proceed to grade the assignment if it's not in DRAFT state
+    # Grades the assignment with one conditional UPDATE, only if it is not in DRAFT state
     graded_assignment = Assignment.mark_grade(
         _id=grade_assignment_payload.id,
         grade=grade_assignment_payload.grade,
         auth_principal=p  # Principal is grading
     )
-    
+
+    # serialized before the commit expires the graded row
+    graded_assignment_dump = assignment_serializer.dump(graded_assignment)
     db.session.commit()
-    
-    graded_assignment_dump = AssignmentSchema().dump(graded_assignment)
-    return APIResponse.respond(data=graded_assignment_dump)
\ No newline at end of file
+    return APIResponse.respond(data=graded_assignment_dump)
+
+
+# Principal can (re-)grade many assignments at once, in one transaction. Each item gets its own result.
+@principal_assignments_resources.route('/assignments/grade/bulk', methods=['POST'], strict_slashes=False)
+@decorators.accept_payload
+@decorators.authenticate_principal
+def grade_assignments_bulk_for_principal(p, incoming_payload):
+    """Grade a list of assignments"""
+    grade_assignments_payload = AssignmentGradeSchema(many=True).load(incoming_payload)
+
+    results = Assignment.mark_grades(
+        grades=[(payload.id, payload.grade) for payload in grade_assignments_payload],
+        auth_principal=p
+    )
+
+    # serialized before the commit expires the graded rows
+    results_dump = dump_bulk_results(results)
+    db.session.commit()
+    return APIResponse.respond(data=results_dump)
+
+
+# Principal can import assignments from a CSV or NDJSON body, read and inserted chunk by chunk.
+# Valid rows are committed, the first IMPORT_MAX_REJECTS invalid ones are returned with their errors.
+@principal_assignments_resources.route('/assignments/import', methods=['POST'], strict_slashes=False)
+@decorators.authenticate_principal
+def import_assignments_for_principal(p):
+    """Import assignments"""
+    assertions.assert_valid(
+        request.mimetype in (streams.CSV_MIMETYPE, streams.NDJSON_MIMETYPE),
+        'body should be {0} or {1}'.format(streams.CSV_MIMETYPE, streams.NDJSON_MIMETYPE)
+    )
+
+    rejects = []
+
+    def reject(number, record, errors):
+        if len(rejects) < Config.IMPORT_MAX_REJECTS:
+            rejects.append({'record': number, 'errors': errors})
+
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    imported, rejected = import_assignments(
+        streams.iter_records(lines, request.mimetype), Config.IMPORT_CHUNK_SIZE, reject
+    )
+    return APIResponse.respond(data={'imported': imported, 'rejected': rejected, 'rejects': rejects})
+
+
+EXPORT_COLUMNS = ('id', 'student_id', 'teacher_id', 'content', 'state', 'grade', 'created_at', 'updated_at')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return getattr(value, 'value', value)
+
+
+# Principal can export the assignments as CSV, optionally filtered by state, grade and teacher_id.
+# Rows come from a server-side cursor on a read-only connection of the read engine and are written in chunks, so memory stays flat.
+@principal_assignments_resources.route('/assignments/export.csv', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def export_assignments_for_principal(p):
+    """Export assignments as CSV"""
+    filters = AssignmentFilterSchema().load(request.args)
+    query = Assignment.apply_filters(Assignment.query_by_principal(), **filters)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        with db.get_read_engine().connect() as connection, sqlite.read_only(connection):
+            for index, row in enumerate(Assignment.iter_rows(connection, query), start=1):
+                writer.writerow([_csv_value(row[column]) for column in EXPORT_COLUMNS])
+                if index % STREAM_CHUNK_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=streams.CSV_MIMETYPE,
+        headers={'Content-Disposition': 'attachment; filename=assignments.csv'}
+    )
@@ -1,8 +1,10 @@
-from marshmallow import Schema, EXCLUDE, fields, post_load
+from datetime import timezone
+from marshmallow import Schema, EXCLUDE, ValidationError, fields, post_load, validates_schema
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow_enum import EnumField
-from core.models.assignments import Assignment, GradeEnum
-from core.libs.helpers import GeneralObject
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+from core.libs.helpers import GeneralObject, get_utc_now
+from core.libs.serializers import CompiledSchema
 
 # Handles serialization and deserialization of Assignment model objects to and from JSON.
 class AssignmentSchema(SQLAlchemyAutoSchema):
@@ -18,6 +20,8 @@ class AssignmentSchema(SQLAlchemyAutoSchema):
     teacher_id = auto_field(dump_only=True)
     student_id = auto_field(dump_only=True)
     grade = auto_field(dump_only=True)
+    # on an edit, the version the client read, see Assignment.upsert
+    version = auto_field(required=False, allow_none=True)
 
     # When deserializing the input data into an object, this method is used to return an instance of the Assignment class
     @post_load
@@ -26,6 +30,23 @@ class AssignmentSchema(SQLAlchemyAutoSchema):
         return Assignment(**data_dict)
 
 
+# Dumps assignments exactly like AssignmentSchema().dump, generated once at import
+assignment_serializer = CompiledSchema(AssignmentSchema)
+
+
+# Per item outcome of a bulk request, built from the (id, assignment, error) tuples returned by the model
+def dump_bulk_results(results):
+    results_dump = []
+    for _id, assignment, error in results:
+        if error is None:
+            results_dump.append({'id': _id, 'status_code': 200, 'data': assignment_serializer.dump(assignment)})
+        else:
+            results_dump.append({
+                'id': _id, 'status_code': error.status_code, 'error': error.__class__.__name__, 'message': error.message
+            })
+    return results_dump
+
+
 # Handles the data for submitting an assignment, like the assignment ID and teacher ID.
 class AssignmentSubmitSchema(Schema):
     class Meta:
@@ -55,5 +76,49 @@ class AssignmentGradeSchema(Schema):
         return GeneralObject(**data_dict)
 
 
+# One row of an assignments import (CSV or NDJSON), loaded into the dict inserted into the assignments table
+class AssignmentImportSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    student_id = fields.Integer(required=True, allow_none=False)
+    teacher_id = fields.Integer(load_default=None)
+    content = fields.String(load_default=None)
+    state = EnumField(AssignmentStateEnum, load_default=AssignmentStateEnum.DRAFT)
+    grade = EnumField(GradeEnum, load_default=None)
+    created_at = fields.AwareDateTime(default_timezone=timezone.utc, load_default=None)
+    updated_at = fields.AwareDateTime(default_timezone=timezone.utc, load_default=None)
+
+    # the same rules as the submit and grade endpoints
+    @validates_schema
+    def validate_state(self, data, **kwargs):
+        # pylint: disable=unused-argument,no-self-use
+        state = data['state']
+        if state != AssignmentStateEnum.DRAFT:
+            if data['teacher_id'] is None:
+                raise ValidationError('a submitted assignment needs a teacher', 'teacher_id')
+            if not data['content']:
+                raise ValidationError('assignment with empty content cannot be submitted', 'content')
+        if (state == AssignmentStateEnum.GRADED) != (data['grade'] is not None):
+            raise ValidationError('only a graded assignment has a grade', 'grade')
+
+    @post_load
+    def fill_timestamps(self, data_dict, many, partial):
+        # pylint: disable=unused-argument,no-self-use
+        data_dict['created_at'] = data_dict['created_at'] or get_utc_now()
+        data_dict['updated_at'] = data_dict['updated_at'] or data_dict['created_at']
+        return data_dict
+
+
+# state / grade / teacher_id query params narrowing an assignment listing or export
+class AssignmentFilterSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    state = EnumField(AssignmentStateEnum, load_default=None)
+    grade = EnumField(GradeEnum, load_default=None)
+    teacher_id = fields.Integer(load_default=None)
+
+
 # post_load:
 # This method is a Marshmallow hook that runs after data is loaded (deserialized). It's used here to instantiate either an Assignment or GeneralObject with the deserialized data.
\ No newline at end of file
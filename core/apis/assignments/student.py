@@ -1,27 +1,37 @@
-from flask import Blueprint, jsonify, make_response
+from flask import Blueprint, jsonify, make_response, request
 from core import db
 from core.apis import decorators
 from core.apis.responses import APIResponse
-from core.models.assignments import Assignment, AssignmentStateEnum
+from core.libs import pagination
+from core.models.assignments import Assignment
 
-from .schema import AssignmentSchema, AssignmentSubmitSchema
+from .schema import AssignmentSchema, AssignmentSubmitSchema, assignment_serializer, dump_bulk_results
 
 # Blueprint is a Flask feature that allows modularization of routes. here, it groups routes related to student assignments under student_assignments_resources
 student_assignments_resources = Blueprint('student_assignments_resources', __name__)
 
 # allows students to list all their assignments.
 @student_assignments_resources.route('/assignments', methods=['GET'], strict_slashes=False)
+@decorators.read_only
 @decorators.authenticate_principal
+@decorators.conditional(lambda p: Assignment.get_fingerprint(Assignment.query_by_student(p.student_id)))
 def list_assignments(p):
     """Returns list of assignments"""
-    # fetch authenticated students assignments using id
-    students_assignments = Assignment.get_assignments_by_student(p.student_id)
+    # streams every assignment when asked to, instead of one page
+    stream_mode = APIResponse.stream_mode()
+    if stream_mode is not None:
+        assignments = Assignment.iter_all(Assignment.query_by_student(p.student_id))
+        return APIResponse.stream(assignments, assignment_serializer.dump, stream_mode)
+
+    # fetch one page of the authenticated students assignments using id
+    limit, cursor = pagination.get_page_args(request.args)
+    students_assignments, next_cursor = Assignment.get_assignments_by_student(p.student_id, limit=limit, cursor=cursor)
 
     # Serializes the list of Assignment
-    students_assignments_dump = AssignmentSchema().dump(students_assignments, many=True)
+    students_assignments_dump = assignment_serializer.dump(students_assignments, many=True)
     
     # Returns the serialized data as an API response.
-    return APIResponse.respond(data=students_assignments_dump)
+    return APIResponse.respond(data=students_assignments_dump, next_cursor=next_cursor)
 
 
 # allows a student to create a new assignment or edit an existing one.
@@ -43,12 +53,25 @@ def upsert_assignment(p, incoming_payload):
 
     # Ensures assignment belongs to the authenticated student, inserts or updates assignment
     assignment.student_id = p.student_id
-    upserted_assignment = Assignment.upsert(assignment)
+    upserted_assignment = Assignment.upsert(assignment, versions=expected_versions(assignment.version, request.if_match))
+
+    # Serializes back into JSON format before the commit expires it, and returns it with its version as the ETag
+    upserted_assignment_dump = assignment_serializer.dump(upserted_assignment)
     db.session.commit()
+    response = APIResponse.respond(data=upserted_assignment_dump)
+    response.set_etag(str(upserted_assignment_dump['version']))
+    return response
 
-    # Serializes back into JSON format and returns.
-    upserted_assignment_dump = AssignmentSchema().dump(upserted_assignment)
-    return APIResponse.respond(data=upserted_assignment_dump)
+
+# Versions an edit may apply to: the `version` of the payload and / or the parsed If-Match header (the ETag of an
+# earlier response). None when neither is sent, the edit then overwrites whatever version is current.
+def expected_versions(payload_version, if_match):
+    versions = None if payload_version is None else {payload_version}
+    if if_match and not if_match.star_tag:
+        # an ETag that is not a version matches nothing
+        header_versions = {int(etag) for etag in if_match.as_set() if etag.isdigit()}
+        versions = header_versions if versions is None else versions & header_versions
+    return versions
 
 
 # This endpoint allows a student to submit an assignment to a teacher.
@@ -60,35 +83,16 @@ def submit_assignment(p, incoming_payload):
     # Deserializes the payload
     submit_assignment_payload = AssignmentSubmitSchema().load(incoming_payload)
 
-    # Fetch the assignment by ID
-    assignment = Assignment.query.get(submit_assignment_payload.id)
-
-    # Check if the assignment is in DRAFT state
-    # if assignment.state != AssignmentStateEnum.DRAFT:
-    # if assignment.state == AssignmentStateEnum.SUBMITTED or assignment.state == AssignmentStateEnum.GRADED:
-    if assignment.state in {AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED}:
-
-        return APIResponse.respond(
-            message='only a draft assignment can be submitted',
-            error="FyleError",  
-            status_code=400  # Set the status code to 400
-        )
-
-    # assignment.state = AssignmentStateEnum.SUBMITTED
-    # assignment.teacher_id = submit_assignment_payload.teacher_id
-
+    # Submits the draft with one conditional UPDATE, the model explains a refusal
     submitted_assignment = Assignment.submit(
         _id=submit_assignment_payload.id,
         teacher_id=submit_assignment_payload.teacher_id,
         auth_principal=p,
-        
     )
 
-    # Commit the changes to the database
+    # Serialized before the commit expires the submitted row, then commit the changes to the database
+    submitted_assignment_dump = assignment_serializer.dump(submitted_assignment)
     db.session.commit()
-
-    # Serialize to JSON format and return.
-    submitted_assignment_dump = AssignmentSchema().dump(submitted_assignment)
     return APIResponse.respond(data=submitted_assignment_dump)
 
     # return make_response(jsonify({
@@ -99,4 +103,20 @@ def submit_assignment(p, incoming_payload):
     #         }), 200)
 
 
+# This endpoint allows a student to submit many draft assignments at once, in one transaction. Each item gets its own result.
+@student_assignments_resources.route('/assignments/submit/bulk', methods=['POST'], strict_slashes=False)
+@decorators.accept_payload
+@decorators.authenticate_principal
+def submit_assignments_bulk(p, incoming_payload):
+    """Submit a list of assignments"""
+    submit_assignments_payload = AssignmentSubmitSchema(many=True).load(incoming_payload)
 
+    results = Assignment.submit_many(
+        submissions=[(payload.id, payload.teacher_id) for payload in submit_assignments_payload],
+        auth_principal=p
+    )
+
+    # serialized before the commit expires the submitted rows
+    results_dump = dump_bulk_results(results)
+    db.session.commit()
+    return APIResponse.respond(data=results_dump)
@@ -1,25 +1,34 @@
-from flask import abort, Blueprint, jsonify, make_response
+from flask import abort, Blueprint, jsonify, make_response, request
 from core import db
 from core.apis import decorators
 from core.apis.responses import APIResponse
+from core.libs import pagination
 from core.models.assignments import Assignment
 from core.models.assignments import AssignmentStateEnum
-from .schema import AssignmentSchema, AssignmentGradeSchema
+from .schema import AssignmentSchema, AssignmentGradeSchema, assignment_serializer, dump_bulk_results
 teacher_assignments_resources = Blueprint('teacher_assignments_resources', __name__)
-from core import app
 
 
 # Teachers can retrieve all assignment
 @teacher_assignments_resources.route('/assignments', methods=['GET'], strict_slashes=False)
+@decorators.read_only
 @decorators.authenticate_principal
+@decorators.conditional(lambda p: Assignment.get_fingerprint(Assignment.query_by_teacher(p.teacher_id)))
 def list_assignments(p):
     """Returns list of assignments"""
-    # Fetches all assignments accessed by teacher.
-    teachers_assignments = Assignment.get_assignments_by_teacher(p.teacher_id)
+    # streams every assignment when asked to, instead of one page
+    stream_mode = APIResponse.stream_mode()
+    if stream_mode is not None:
+        assignments = Assignment.iter_all(Assignment.query_by_teacher(p.teacher_id))
+        return APIResponse.stream(assignments, assignment_serializer.dump, stream_mode)
+
+    # Fetches one page of the assignments accessed by teacher.
+    limit, cursor = pagination.get_page_args(request.args)
+    teachers_assignments, next_cursor = Assignment.get_assignments_by_teacher(p.teacher_id, limit=limit, cursor=cursor)
 
     # Serializes the list of Assignment and returns.
-    teachers_assignments_dump = AssignmentSchema().dump(teachers_assignments, many=True)
-    return APIResponse.respond(data=teachers_assignments_dump)
+    teachers_assignments_dump = assignment_serializer.dump(teachers_assignments, many=True)
+    return APIResponse.respond(data=teachers_assignments_dump, next_cursor=next_cursor)
 
 
 # Teachers can grade a specific assignment by submitting the assignment ID and grade.
@@ -31,51 +40,38 @@ def grade_assignment(p, incoming_payload):
     # Deserializes the incoming JSON
     grade_assignment_payload = AssignmentGradeSchema().load(incoming_payload)
 
-    assignment = Assignment.query.get(grade_assignment_payload.id)
-
-    if not assignment:
-        return APIResponse.respond(
-            message='Assignment not found.',
-            error="FyleError",
-            status_code=404  
-        )
-
-    # if assignment.state != AssignmentStateEnum.SUBMITTED:
-    if assignment.state == AssignmentStateEnum.DRAFT:
-        return APIResponse.respond(
-            message='Only a Submitted assignment can be given Grade.',
-            error="FyleError", 
-            status_code=400   
-        )
-    
-    if assignment.teacher_id != p.teacher_id:
-        return APIResponse.respond(
-            message='You are not authorized to grade this assignment.',
-            error="FyleError",
-            status_code=400
-        )
-
-        # return make_response(jsonify({
-        #     'assignment id': assignment.id,
-        #     'pteacherid': p.teacher_id,
-        #     'teacher_id': assignment.teacher_id,
-        #     'message': 'You are not authorized to grade this assignment.',
-        #     'error': 'FyleError'
-        # }), 400)
-
-    # Grades the assignment from provided grade and commits
+    # Grades the assignment with one conditional UPDATE, only if it was submitted to this teacher, and commits
     graded_assignment = Assignment.mark_grade(
         _id=grade_assignment_payload.id,
         grade=grade_assignment_payload.grade,
         auth_principal=p
     )
-    db.session.commit()
 
-    #  Serializes the graded_assignment back to json
-    graded_assignment_dump = AssignmentSchema().dump(graded_assignment)
+    #  Serializes the graded_assignment back to json, before the commit expires it
+    graded_assignment_dump = assignment_serializer.dump(graded_assignment)
+    db.session.commit()
     return APIResponse.respond(data=graded_assignment_dump)
 
 
+# Teachers can grade many assignments at once, in one transaction. Each item gets its own result.
+@teacher_assignments_resources.route('/assignments/grade/bulk', methods=['POST'], strict_slashes=False)
+@decorators.accept_payload
+@decorators.authenticate_principal
+def grade_assignments_bulk(p, incoming_payload):
+    """Grade a list of assignments"""
+    grade_assignments_payload = AssignmentGradeSchema(many=True).load(incoming_payload)
+
+    results = Assignment.mark_grades(
+        grades=[(payload.id, payload.grade) for payload in grade_assignments_payload],
+        auth_principal=p
+    )
+
+    # serialized before the commit expires the graded rows
+    results_dump = dump_bulk_results(results)
+    db.session.commit()
+    return APIResponse.respond(data=results_dump)
+
+
 @teacher_assignments_resources.route('/abort', methods=['GET'], strict_slashes=False)
 @decorators.authenticate_principal
 def teacher_abort(p):
@@ -1,7 +1,12 @@
+import hashlib
 import json
+from functools import lru_cache, wraps
 from flask import request
+from core import db
+from core.apis.responses import APIResponse
+from core.config import Config
 from core.libs import assertions
-from functools import wraps
+from core.libs.cache import RefreshingCache, invalidate_on_commit
 
 
 class AuthPrincipal:
@@ -11,6 +16,96 @@ class AuthPrincipal:
         self.teacher_id = teacher_id
         self.principal_id = principal_id
 
+
+# the principal id required by the routes under each url prefix, and the error when it is missing
+ROLES = {
+    '/student': ('student_id', 'requester should be a student'),
+    '/teacher': ('teacher_id', 'requester should be a teacher'),
+    '/principal': ('principal_id', 'requester should be a principal'),
+}
+# blueprint name -> role, resolved on the first request each blueprint serves
+_role_by_blueprint = {}
+
+
+def _load_principal_directory():
+    # imported here as the models import this module for AuthPrincipal
+    from core import db
+    from core.models.principals import Principal
+    from core.models.students import Student
+    from core.models.teachers import Teacher
+
+    return {
+        role: dict(db.session.query(model.id, model.user_id))
+        for role, model in (('student_id', Student), ('teacher_id', Teacher), ('principal_id', Principal))
+    }
+
+
+# {'student_id': {id: user_id}, ...} of every principal that may call the API, so authentication
+# checks the ids in the header without a query per request
+principal_directory = RefreshingCache(_load_principal_directory, ttl=Config.PRINCIPAL_DIRECTORY_TTL)
+
+
+# reload the directory once a transaction that touched students, teachers or principals is committed
+invalidate_on_commit(principal_directory, {'students', 'teachers', 'principals'})
+
+
+# X-Principal values repeat across requests, so the parsed (user_id, student_id, teacher_id, principal_id) is cached
+@lru_cache(maxsize=4096)
+def _parse_principal(p_str):
+    try:
+        p_dict = json.loads(p_str)
+        p_ids = (p_dict['user_id'], p_dict.get('student_id'), p_dict.get('teacher_id'), p_dict.get('principal_id'))
+    except (ValueError, TypeError, KeyError):
+        return None
+
+    if not all(_id is None or type(_id) is int for _id in p_ids):
+        return None
+    return p_ids
+
+
+# (role id, error) required by the routes under `path`, or None
+def role_for_path(path):
+    return next((role for prefix, role in ROLES.items() if path.startswith(prefix)), None)
+
+
+def _required_role():
+    blueprint = request.blueprint
+    if blueprint not in _role_by_blueprint:
+        _role_by_blueprint[blueprint] = role_for_path(request.path)
+    return _role_by_blueprint[blueprint]
+
+
+def principal_from_header(p_str, role, directory=None):
+    """The AuthPrincipal of an X-Principal header value, checked against `role` (see ROLES) and the principal
+    directory (by default principal_directory.get()). Raises a FyleError when it is missing, malformed, of the wrong
+    role or unknown."""
+    # Checks principal exists (assert_auth), converts principal string into a (cached) AuthPrincipal object.
+    assertions.assert_auth(p_str is not None, 'principal not found')
+    p_ids = _parse_principal(p_str)
+    assertions.assert_auth(p_ids is not None, 'invalid principal')
+    p = AuthPrincipal(*p_ids)
+
+    #  verifies that the user is authorized
+    if role is not None:
+        role_id, message = role
+        assertions.assert_true(getattr(p, role_id) is not None, message)
+
+    # every id in the header should belong to the user
+    if directory is None:
+        directory = principal_directory.get()
+    for role_id, members in directory.items():
+        _id = getattr(p, role_id)
+        if _id is not None:
+            assertions.assert_auth(members.get(_id, object()) == p.user_id, 'principal not found')
+    return p
+
+
+# Strong ETag of a list response: the URL, Accept header, caller and fingerprint of the caller's scope
+def list_etag(full_path, accept, p, fingerprint):
+    key = [full_path, accept, p.user_id, p.student_id, p.teacher_id, p.principal_id, *fingerprint]
+    return hashlib.sha1(json.dumps(key, default=str).encode('utf-8')).hexdigest()
+
+
 # @accept_payload: decorator intercepts a function call, retrieves JSON payload from the request, parses it, and passes the parsed payload as the first argument to the original function,
 def accept_payload(func):
     @wraps(func)
@@ -20,38 +115,47 @@ def accept_payload(func):
     return wrapper
 
 
-# @authenticate_principal, it intercepts the request and retrieves the X-Principal header
-def authenticate_principal(func):
+# @conditional(fingerprint): wraps a GET handler (below @authenticate_principal) with a strong ETag derived from
+# fingerprint(p), a cheap aggregate such as (row count, max updated_at) of the caller's scope.
+# A matching If-None-Match returns 304 before the handler loads or serializes any row.
+def conditional(fingerprint):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(p, *args, **kwargs):
+            etag = list_etag(request.full_path, request.headers.get('Accept'), p, fingerprint(p))
+
+            if request.if_none_match.contains_weak(etag):
+                response = APIResponse(status=304)
+            else:
+                response = func(p, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+
+# cookie of the clients that wrote within READ_YOUR_WRITES_SECONDS, their reads go to the primary
+READ_PRIMARY_COOKIE = 'read_primary'
+
+
+# @read_only: runs the queries of the route (above @authenticate_principal) on db.get_read_engine(), a read-only SQLite
+# connection or a replica, so long list scans do not hold the primary's connections and locks
+def read_only(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        p_str = request.headers.get('X-Principal')
+        if READ_PRIMARY_COOKIE not in request.cookies:
+            db.session.info['read_only'] = True
+        return func(*args, **kwargs)
+    return wrapper
 
-        # Checks principal exists (assert_auth), converts principal string into Python dictionary, and instantiates an AuthPrincipal object.
-        assertions.assert_auth(p_str is not None, 'principal not found')
-        p_dict = json.loads(p_str)
 
-        # assertions.assert_auth(p_str is not None and p_str.strip(), 'Principal header is missing or empty')
-        # try:
-        #     p_dict = json.loads(p_str)
-        # except json.JSONDecodeError:
-        #     assertions.assert_auth(False, 'Invalid JSON in Principal header')
-
-        p = AuthPrincipal(
-            user_id=p_dict['user_id'],
-            student_id=p_dict.get('student_id'),
-            teacher_id=p_dict.get('teacher_id'),
-            principal_id=p_dict.get('principal_id')
-        )
-
-        #  verifies that the user is authorized
-        if request.path.startswith('/student'):
-            assertions.assert_true(p.student_id is not None, 'requester should be a student')
-        elif request.path.startswith('/teacher'):
-            assertions.assert_true(p.teacher_id is not None, 'requester should be a teacher')
-        elif request.path.startswith('/principal'):
-            assertions.assert_true(p.principal_id is not None, 'requester should be a principal')
-        # else:
-        #     assertions.assert_found(None, 'No such api')
+# @authenticate_principal, it intercepts the request and retrieves the X-Principal header
+def authenticate_principal(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        p = principal_from_header(request.headers.get('X-Principal'), _required_role())
 
         # passes the AuthPrincipal object (p) to the original function
         return func(p, *args, **kwargs)
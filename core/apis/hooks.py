@@ -0,0 +1,121 @@
+import logging
+from flask import current_app, jsonify, request
+from core import db
+from core.apis import decorators
+from core.libs import helpers, metrics
+from core.libs.exceptions import FyleError
+from werkzeug.exceptions import HTTPException
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# blueprints handling the student, teacher and principal APIs, imported on the first request (core/libs/lazy.py)
+BLUEPRINTS = [
+    ('core.apis.assignments:student_assignments_resources', '/student'),
+    ('core.apis.assignments:teacher_assignments_resources', '/teacher'),
+    ('core.apis.assignments.principal:principal_assignments_resources', '/principal'),
+    ('core.apis.teachers.principal:principal_teachers_resources', '/principal'),
+    ('core.apis.reports.principal:principal_reports_resources', '/principal'),
+]
+
+# flask CLI commands, imported when run
+COMMANDS = [
+    ('grade-stats', 'core.commands:grade_stats_cli'),
+    ('seed', 'core.commands:seed_command'),
+    ('assignments', 'core.commands:assignments_cli'),
+]
+
+
+# Registers the routes, hooks, error handler and commands of the API on `app`, see core.create_app
+def init_app(app):
+    for import_name, url_prefix in BLUEPRINTS:
+        app.register_lazy_blueprint(import_name, url_prefix=url_prefix)
+    for name, import_name in COMMANDS:
+        app.cli.add_lazy_command(name, import_name)
+
+    app.add_url_rule('/', 'ready', ready)
+    app.config['TRAP_HTTP_EXCEPTIONS'] = True
+    app.after_request(remember_writer)
+    app.teardown_request(end_read_only)
+    app.register_error_handler(Exception, handle_error)
+
+
+# the root URL.
+def ready():
+    response = jsonify({
+        'status': 'ready',
+        'time': helpers.get_utc_now()
+    })
+
+    return response
+
+
+# read your writes: after a successful write, the client reads from the primary for READ_YOUR_WRITES_SECONDS
+def remember_writer(response):
+    seconds = current_app.config['READ_YOUR_WRITES_SECONDS']
+    if seconds and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        response.set_cookie(decorators.READ_PRIMARY_COOKIE, '1', max_age=seconds, httponly=True)
+    return response
+
+
+# an app context can outlive the request (tests, CLI), its session goes back to the primary
+def end_read_only(exc):
+    db.session.info.pop('read_only', None)
+
+# (JSON body, status code) of the response to `err`, None for the errors left to Flask (a 500).
+# Shared with the async app (core/asgi) so both answer errors alike.
+def error_body(err):
+    # imported here, marshmallow is only loaded along with the views whose schemas raise it
+    from marshmallow.exceptions import ValidationError
+
+    # Handle custom application-specific errors (FyleError)
+    if isinstance(err, FyleError):
+        return dict(
+            error=err.__class__.__name__,  
+            message=err.message 
+        ), err.status_code 
+
+    # Handle validation errors from Marshmallow
+    elif isinstance(err, ValidationError):
+        return dict(
+            error=err.__class__.__name__,  
+            message=err.messages  
+        ), 400
+
+    elif isinstance(err, IntegrityError):
+        return dict(
+            error=err.__class__.__name__, 
+            message=str(err.orig)  
+        ), 400
+
+  
+    elif isinstance(err, HTTPException):
+        return dict(
+            error=err.__class__.__name__,  
+            message=str(err) 
+        ), err.code
+
+    return None
+
+
+# Global error handler for the application, catches any exception that inherits from Python's built-in Exception class
+def handle_error(err):
+    logger.debug('handling %s', err.__class__.__name__)
+    body = error_body(err)
+    if body is not None:
+        metrics.count_error(err, body[1])
+        return jsonify(**body[0]), body[1]
+
+    # if err.code != 409:  # Skip 409 Conflict
+    #     if isinstance(err, HTTPException):
+    #         print("inside HTTPException")
+    #         return jsonify(
+    #             error=err.__class__.__name__,
+    #             message=str(err)
+    #         ), err.code
+
+    metrics.count_error(err, 500)
+    # If the error doesn't match any known cases, raise err is executed, and passed back to Flask’s default error handling mechanism
+    raise err
+
@@ -0,0 +1,27 @@
+from flask import Blueprint
+from core.apis import decorators
+from core.apis.responses import APIResponse
+from core.models.grade_stats import GradeStat
+
+principal_reports_resources = Blueprint('principal_reports_resources', __name__)
+
+
+# Principal can see how many graded assignments each student has (tests/SQL/number_of_graded_assignments_for_each_student.sql)
+@principal_reports_resources.route('/reports/graded-assignments', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def graded_assignments_per_student(p):
+    rows = GradeStat.graded_assignments_per_student()
+    graded_assignments_dump = [
+        {'student_id': student_id, 'graded_assignments_count': count} for student_id, count in rows
+    ]
+    return APIResponse.respond(data=graded_assignments_dump)
+
+
+# Principal can see the grade A count of the teacher who graded the most assignments
+# (tests/SQL/count_grade_A_assignments_by_teacher_with_max_grading.sql)
+@principal_reports_resources.route('/reports/top-grader-grade-a', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def grade_a_count_for_top_grader(p):
+    top_grader = GradeStat.grade_a_count_for_top_grader()
+    teacher_id, grade_a_count = top_grader if top_grader is not None else (None, 0)
+    return APIResponse.respond(data={'teacher_id': teacher_id, 'grade_a_count': grade_a_count})
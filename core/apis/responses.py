@@ -1,16 +1,67 @@
-from flask import Response, jsonify, make_response
+from flask import Response, json, jsonify, make_response, request, stream_with_context
+from core.libs.streams import NDJSON_MIMETYPE
+
+# number of serialized rows written to the socket at once while streaming
+STREAM_CHUNK_SIZE = 500
+
+
+# body of APIResponse.respond, also answered by the async app (core/asgi)
+def envelope(data=None, message=None, error=None, next_cursor=None):
+    response_data = {}
+    
+    if message:
+        response_data['message'] = message
+    if error:
+        response_data['error'] = error
+    if data is not None:
+        response_data['data'] = data
+    if next_cursor is not None:
+        response_data['next_cursor'] = next_cursor
+        
+    return response_data
+
+
+# stream mode of a request with these parsed Accept mimetypes and query args, see APIResponse.stream_mode
+def stream_mode_of(accept_mimetypes, args):
+    if accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return NDJSON_MIMETYPE
+    if args.get('stream') in ('1', 'true'):
+        return 'application/json'
+    return None
 
 
 class APIResponse(Response):
     @classmethod
-    def respond(cls, data=None, message=None, error=None, status_code=200):
-        response_data = {}
-        
-        if message:
-            response_data['message'] = message
-        if error:
-            response_data['error'] = error
-        if data is not None:
-            response_data['data'] = data
-            
-        return make_response(jsonify(response_data), status_code)
+    def respond(cls, data=None, message=None, error=None, status_code=200, next_cursor=None):
+        return make_response(jsonify(envelope(data, message, error, next_cursor)), status_code)
+
+    # Returns NDJSON_MIMETYPE or 'application/json' when the client asked for a streamed list, else None
+    @classmethod
+    def stream_mode(cls):
+        return stream_mode_of(request.accept_mimetypes, request.args)
+
+    # Serializes rows one by one from a generator so memory stays flat whatever the result size.
+    # NDJSON writes one object per line, JSON keeps the {"data": [...]} envelope of respond()
+    @classmethod
+    def stream(cls, rows, serialize, mimetype='application/json'):
+        def dumps(row):
+            return json.dumps(serialize(row), separators=(',', ':'))
+
+        def generate():
+            ndjson = mimetype == NDJSON_MIMETYPE
+            chunk = [] if ndjson else ['{"data":[']
+            separator = ''
+            for index, row in enumerate(rows, start=1):
+                if ndjson:
+                    chunk.append(dumps(row) + '\n')
+                else:
+                    chunk.append(separator + dumps(row))
+                    separator = ','
+                if index % STREAM_CHUNK_SIZE == 0:
+                    yield ''.join(chunk)
+                    chunk = []
+            if not ndjson:
+                chunk.append(']}')
+            yield ''.join(chunk)
+
+        return cls(stream_with_context(generate()), mimetype=mimetype)
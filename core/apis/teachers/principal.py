@@ -2,19 +2,32 @@ from flask import Blueprint
 from core import db
 from core.apis import decorators
 from core.apis.responses import APIResponse
+from core.config import Config
+from core.libs.cache import RefreshingCache, invalidate_on_commit
 from core.models.teachers import Teacher
 # from core.models.users import User
-from .schema import TeacherSchema
+from .schema import TeacherSchema, teacher_serializer
 
 
 principal_teachers_resources = Blueprint('principal_teachers_resources', __name__)
 
+
+def _load_teachers_snapshot():
+    fingerprint = Teacher.get_fingerprint()
+    return teacher_serializer.dump(Teacher.get_teachers(), many=True), fingerprint
+
+
+# (serialized teachers, fingerprint) served to every principal, so repeated reads skip both the query and the dump
+teachers_snapshot = RefreshingCache(_load_teachers_snapshot, ttl=Config.TEACHERS_SNAPSHOT_TTL)
+invalidate_on_commit(teachers_snapshot, {'teachers'})
+
 # Principal can retrieve all teahchers.
 @principal_teachers_resources.route('/teachers', methods=['GET'], strict_slashes=False)
+@decorators.read_only
 @decorators.authenticate_principal
+@decorators.conditional(lambda p: teachers_snapshot.get()[1])
 def list_teachers_for_principal(p):
-    teachers = Teacher.get_teachers()
-    teachers_dump = TeacherSchema().dump(teachers, many=True)
+    teachers_dump, _ = teachers_snapshot.get()
     return APIResponse.respond(data=teachers_dump)
 
 
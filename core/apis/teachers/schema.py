@@ -3,6 +3,7 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow_enum import EnumField
 from core.models.teachers import Teacher
 from core.libs.helpers import GeneralObject
+from core.libs.serializers import CompiledSchema
 
 # Handles serialization and deserialization of Teacher model 
 class TeacherSchema(SQLAlchemyAutoSchema):
@@ -18,3 +19,7 @@ class TeacherSchema(SQLAlchemyAutoSchema):
     @post_load
     def initiate_class(self, data_dict, many, partial):
         return Teacher(**data_dict)
+
+
+# Dumps teachers exactly like TeacherSchema().dump, generated once at import
+teacher_serializer = CompiledSchema(TeacherSchema)
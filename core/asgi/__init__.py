@@ -0,0 +1,40 @@
+"""Async serving mode: `uvicorn core.asgi:app`.
+
+The hot assignment and teacher routes are served by async views (core/asgi/assignments.py, teachers.py) on an
+async engine, so one process keeps many requests in flight while they wait on the database. Every other URL
+(bulk changes, imports, exports, reports, /metrics...) goes to the Flask app, run in a thread pool.
+"""
+from starlette.applications import Starlette
+from starlette.routing import Mount, Route
+from . import assignments, teachers
+from .database import engine
+from .http import flask_app
+
+routes = [
+    Route('/student/assignments', assignments.list_student_assignments, methods=['GET']),
+    Route('/student/assignments', assignments.upsert_assignment, methods=['POST']),
+    Route('/student/assignments/submit', assignments.submit_assignment, methods=['POST']),
+    Route('/teacher/assignments', assignments.list_teacher_assignments, methods=['GET']),
+    Route('/teacher/assignments/grade', assignments.grade_assignment, methods=['POST']),
+    Route('/principal/assignments', assignments.list_principal_assignments, methods=['GET']),
+    Route('/principal/assignments/grade', assignments.grade_assignment_for_principal, methods=['POST']),
+    Route('/principal/teachers', teachers.list_teachers_for_principal, methods=['GET']),
+]
+# the routes are strict_slashes=False in Flask, so the URLs with a trailing slash are served alike
+routes += [Route(route.path + '/', route.endpoint, methods=route.methods) for route in list(routes)]
+
+
+# Opens a first connection before serving: until one has, a new pool runs its connect hooks under a thread lock,
+# which requests connecting together would block the event loop on
+async def _connect_engine():
+    async with engine.connect():
+        pass
+
+
+async def _dispose_engine():
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=routes + [Mount('/', app=flask_app)], on_startup=[_connect_engine], on_shutdown=[_dispose_engine]
+)
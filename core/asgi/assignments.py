@@ -0,0 +1,126 @@
+from sqlalchemy import select
+from werkzeug.http import quote_etag
+from core.apis.assignments.schema import AssignmentGradeSchema, AssignmentSchema, AssignmentSubmitSchema, assignment_serializer
+from core.apis.assignments.student import expected_versions
+from core.apis.decorators import principal_directory
+from core.libs import assertions, pagination
+from core.models.assignments import Assignment
+from .database import Session
+from .http import Fallback, authenticate, conditional, endpoint, if_match, read_payload, refresh, respond, stream_mode
+
+# Async versions of the single assignment routes of core/apis/assignments, same URLs, payloads and responses.
+# The model methods run on the sync facade of the AsyncSession (run_sync), each statement awaiting the driver.
+
+
+async def _list_assignments(request, p, scope, empty_message=None):
+    # streamed lists are left to the Flask views, which write them from a server-side cursor
+    if stream_mode(request) is not None:
+        return Fallback()
+
+    async with Session() as session:
+        async def render():
+            limit, cursor = pagination.get_page_args(request.query_params)
+            statement = pagination.keyset_query(
+                select(Assignment).where(*scope), Assignment.updated_at, Assignment.id, limit, cursor
+            )
+            rows = (await session.execute(statement)).scalars().all()
+            assignments, next_cursor = pagination.page_of(rows, Assignment.updated_at, Assignment.id, limit)
+            if empty_message is not None:
+                assertions.assert_found(assignments, empty_message)
+            return respond(data=assignment_serializer.dump(assignments, many=True), next_cursor=next_cursor)
+
+        fingerprint = tuple((await session.execute(Assignment.fingerprint_statement(scope))).one())
+        return await conditional(request, p, fingerprint, render)
+
+
+# Applies `change(sync_session)`, a model method returning the changed assignment, and commits
+async def _change_assignment(change):
+    async with Session() as session:
+        assignment = await session.run_sync(change)
+        assignment_dump = assignment_serializer.dump(assignment)
+        await session.commit()
+    return assignment_dump
+
+
+@endpoint('student_assignments_resources.list_assignments')
+async def list_student_assignments(request):
+    p = await authenticate(request)
+    return await _list_assignments(request, p, Assignment.student_scope(p.student_id))
+
+
+@endpoint('student_assignments_resources.upsert_assignment')
+async def upsert_assignment(request):
+    incoming_payload = await read_payload(request)
+    p = await authenticate(request)
+    assignment = AssignmentSchema().load(incoming_payload)
+
+    if not assignment.content:
+        return respond(message='Content cannot be empty.', error='EMPTY_CONTENT', status_code=400)
+
+    assignment.student_id = p.student_id
+    versions = expected_versions(assignment.version, if_match(request))
+
+    def create_or_edit(session):
+        created = assignment.id is None
+        changed = Assignment.upsert(assignment, versions=versions, session=session)
+        if created:
+            # nothing is expired on commit here, so a new draft is read back to dump its timestamps as stored
+            session.refresh(changed)
+        return changed
+
+    assignment_dump = await _change_assignment(create_or_edit)
+
+    response = respond(data=assignment_dump)
+    response.headers['ETag'] = quote_etag(str(assignment_dump['version']))
+    return response
+
+
+@endpoint('student_assignments_resources.submit_assignment')
+async def submit_assignment(request):
+    incoming_payload = await read_payload(request)
+    p = await authenticate(request)
+    submit_assignment_payload = AssignmentSubmitSchema().load(incoming_payload)
+    # run_sync runs on the event loop, Assignment.submit must not reload the directory there
+    teacher_ids = (await refresh(principal_directory))['teacher_id']
+
+    return respond(data=await _change_assignment(lambda session: Assignment.submit(
+        _id=submit_assignment_payload.id,
+        teacher_id=submit_assignment_payload.teacher_id,
+        auth_principal=p,
+        session=session,
+        teacher_ids=teacher_ids
+    )))
+
+
+@endpoint('teacher_assignments_resources.list_assignments')
+async def list_teacher_assignments(request):
+    p = await authenticate(request)
+    return await _list_assignments(request, p, Assignment.teacher_scope(p.teacher_id))
+
+
+# the teacher and principal grade routes, Assignment.mark_grade tells them apart by the principal
+async def _grade_assignment(request):
+    incoming_payload = await read_payload(request)
+    p = await authenticate(request)
+    grade_assignment_payload = AssignmentGradeSchema().load(incoming_payload)
+
+    return respond(data=await _change_assignment(lambda session: Assignment.mark_grade(
+        _id=grade_assignment_payload.id,
+        grade=grade_assignment_payload.grade,
+        auth_principal=p,
+        session=session
+    )))
+
+
+grade_assignment = endpoint('teacher_assignments_resources.grade_assignment')(_grade_assignment)
+
+
+@endpoint('principal_assignments_resources.list_assignments_for_principal')
+async def list_principal_assignments(request):
+    p = await authenticate(request)
+    return await _list_assignments(
+        request, p, Assignment.principal_scope(), empty_message='No assignments found for this principal'
+    )
+
+
+grade_assignment_for_principal = endpoint('principal_assignments_resources.grade_assignment_for_principal')(_grade_assignment)
@@ -0,0 +1,39 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from core import app, db
+from core.libs import metrics, sqlite
+from core.libs.pools import pool_options
+
+# async driver used for the database of the Flask app, by backend
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+# The sync engine's URL (with the SQLite path Flask-SQLAlchemy resolved) on the async driver of its backend
+def async_url(url):
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def create_engine(config):
+    """Async engine on the database of the Flask app, with the same SQLite pragmas, pool checks and SQL metrics.
+    Up to ASYNC_POOL_SIZE connections are pooled, aiosqlite would otherwise open a connection (and its thread) per session."""
+    url = make_url(config['ASYNC_DATABASE_URL']) if config['ASYNC_DATABASE_URL'] else async_url(db.engine.url)
+    options = pool_options(config, url)
+    options.pop('connect_args', None)
+    options.update(poolclass=AsyncAdaptedQueuePool, pool_size=config['ASYNC_POOL_SIZE'], max_overflow=0)
+    engine = create_async_engine(url, **options)
+    metrics.install_sql_metrics(engine.sync_engine)
+    if engine.dialect.name == 'sqlite':
+        sqlite.install_pragmas(engine.sync_engine, sqlite.get_pragmas(config['SQLITE_PROFILE'], config['SQLITE_PRAGMAS']))
+    return engine
+
+
+engine = create_engine(app.config)
+
+# one session per request: `async with Session() as session`. Nothing is expired on commit, as reloading an
+# attribute outside of run_sync() / await would need I/O the event loop cannot do there
+Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
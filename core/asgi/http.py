@@ -0,0 +1,136 @@
+import logging
+import time
+from functools import wraps
+from a2wsgi import WSGIMiddleware
+from flask import json
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import BadRequest
+from werkzeug.http import parse_accept_header, parse_etags, parse_options_header, quote_etag
+from core import app
+from core.apis.decorators import list_etag, principal_directory, principal_from_header, role_for_path
+from core.apis.hooks import error_body
+from core.apis.responses import envelope, stream_mode_of
+from core.libs import log, metrics
+
+logger = logging.getLogger(__name__)
+
+# the Flask app as an ASGI app, run in a pool of threads: serves every route without an async version
+flask_app = WSGIMiddleware(app)
+
+
+def respond(data=None, message=None, error=None, status_code=200, next_cursor=None):
+    """APIResponse.respond for the async routes: the same JSON body, encoded like jsonify"""
+    body = json.dumps(envelope(data, message, error, next_cursor), app=app, separators=(',', ':')) + '\n'
+    return Response(body, status_code=status_code, media_type='application/json')
+
+
+def in_app_context(func, *args):
+    # Flask-SQLAlchemy's session is removed when the app context ends, so a sync loader leaves no transaction open
+    with app.app_context():
+        return func(*args)
+
+
+_STALE = object()
+
+
+# Value of `cache`, loaded in a worker thread when it is stale, as its loader queries the database through the sync session
+async def refresh(cache):
+    value = cache.get_if_fresh(_STALE)
+    if value is _STALE:
+        value = await run_in_threadpool(in_app_context, cache.get)
+    return value
+
+
+async def authenticate(request):
+    """AuthPrincipal of the X-Principal header, with the checks of @decorators.authenticate_principal"""
+    directory = await refresh(principal_directory)
+    return principal_from_header(request.headers.get('X-Principal'), role_for_path(request.url.path), directory)
+
+
+async def read_payload(request):
+    """The JSON body like Flask's request.json: None unless the body is JSON, a 400 when it does not parse"""
+    mimetype, _ = parse_options_header(request.headers.get('Content-Type'))
+    if not (mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))):
+        return None
+    try:
+        return json.loads(await request.body())
+    except ValueError as err:
+        raise BadRequest('Failed to decode JSON object: {0}'.format(err))
+
+
+def if_match(request):
+    return parse_etags(request.headers.get('If-Match'))
+
+
+def stream_mode(request):
+    return stream_mode_of(parse_accept_header(request.headers.get('Accept'), MIMEAccept), request.query_params)
+
+
+async def conditional(request, p, fingerprint, render):
+    """@decorators.conditional for the async routes: a 304 when If-None-Match has the ETag of the caller's scope,
+    else the response of `await render()`, with the ETag when it is a 200"""
+    full_path = '{0}?{1}'.format(request.url.path, request.scope['query_string'].decode('latin-1'))
+    etag = list_etag(full_path, request.headers.get('Accept'), p, fingerprint)
+
+    if parse_etags(request.headers.get('If-None-Match')).contains_weak(etag):
+        response = Response(status_code=304)
+    else:
+        response = await render()
+        if response.status_code != 200:
+            return response
+    response.headers['ETag'] = quote_etag(etag)
+    return response
+
+
+class Fallback:
+    """Response handing the request over to the Flask app, for the modes the async routes do not serve"""
+
+    async def __call__(self, scope, receive, send):
+        await flask_app(scope, receive, send)
+
+
+def endpoint(name):
+    """Serves an async route like the Flask view `name` (blueprint.view): X-Request-Id, the access log line,
+    the metrics under the same endpoint label, and errors answered as by the Flask error handler"""
+    access_sample_rate = app.config['LOG_ACCESS_SAMPLE_RATE']
+    access_logger = logging.getLogger(app.import_name)
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request):
+            started = time.perf_counter()
+            request_id = log.request_id_of(request.headers)
+            statements = [0]
+            tokens = (
+                log.current_request_id.set(request_id),
+                metrics.current_endpoint.set(name),
+                metrics.current_sql_statements.set(statements),
+            )
+            try:
+                try:
+                    response = await func(request)
+                except Exception as err:
+                    logger.debug('handling %s', err.__class__.__name__)
+                    body = error_body(err)
+                    if body is None:
+                        metrics.count_error(err, 500)
+                        raise
+                    metrics.count_error(err, body[1])
+                    response = respond(**body[0], status_code=body[1])
+
+                if isinstance(response, Fallback):
+                    return response
+                response.headers[log.REQUEST_ID_HEADER] = request_id
+                log.log_request(access_logger, request.method, request.url.path, response.status_code, started, access_sample_rate)
+                metrics.observe_request(
+                    name, request.method, response.status_code, started, len(response.body), statements[0]
+                )
+                return response
+            finally:
+                log.current_request_id.reset(tokens[0])
+                metrics.current_endpoint.reset(tokens[1])
+                metrics.current_sql_statements.reset(tokens[2])
+        return wrapper
+    return decorator
@@ -0,0 +1,13 @@
+from core.apis.teachers.principal import teachers_snapshot
+from .http import authenticate, conditional, endpoint, refresh, respond
+
+
+@endpoint('principal_teachers_resources.list_teachers_for_principal')
+async def list_teachers_for_principal(request):
+    p = await authenticate(request)
+    teachers_dump, fingerprint = await refresh(teachers_snapshot)
+
+    async def render():
+        return respond(data=teachers_dump)
+
+    return await conditional(request, p, fingerprint, render)
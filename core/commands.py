@@ -0,0 +1,148 @@
+import json
+import random
+from datetime import timedelta
+from itertools import accumulate
+import click
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import func, select
+from core import db
+from core.apis.assignments.importer import import_assignments
+from core.config import Config
+from core.libs import helpers, streams
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+from core.models.grade_stats import GradeStat
+from core.models.students import Student
+from core.models.teachers import Teacher
+from core.models.users import User
+
+# flask grade-stats check [--fix]
+grade_stats_cli = AppGroup('grade-stats', help='Maintain the grade_stats counters.')
+
+
+@grade_stats_cli.command('check')
+@click.option('--fix', is_flag=True, help='Rebuild grade_stats from the assignments table when it differs.')
+def check_grade_stats(fix):
+    """Rebuilds the counters from scratch and diffs them against the live grade_stats rows."""
+    with db.engine.begin() as connection:
+        differences = GradeStat.diff(connection)
+        for key, expected, live in differences:
+            click.echo('{0}: expected {1}, found {2}'.format(key, expected, live))
+
+        if differences and fix:
+            GradeStat.rebuild(connection)
+            click.echo('grade_stats rebuilt')
+
+    if not differences:
+        click.echo('grade_stats is consistent')
+    elif not fix:
+        raise SystemExit(1)
+
+
+# flask assignments import FILE
+assignments_cli = AppGroup('assignments', help='Bulk operations on assignments.')
+
+
+@assignments_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'input_format', type=click.Choice(['csv', 'ndjson']),
+              help='Input format, guessed from the file extension when left out.')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=Config.IMPORT_CHUNK_SIZE, show_default=True,
+              help='Rows validated, inserted and committed together.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Writes every invalid row with its errors to this file, one JSON object per line.')
+def import_assignments_command(source, input_format, chunk_size, rejects):
+    """Imports assignments from a CSV or NDJSON file ('-' for stdin) with columns student_id, teacher_id, content,
+    state, grade, created_at and updated_at."""
+    if input_format is None:
+        input_format = 'csv' if source.name.endswith('.csv') else 'ndjson'
+    mimetype = streams.CSV_MIMETYPE if input_format == 'csv' else streams.NDJSON_MIMETYPE
+
+    def reject(number, record, errors):
+        if rejects is not None:
+            rejects.write(json.dumps({'record': number, 'row': record, 'errors': errors}) + '\n')
+
+    imported, rejected = import_assignments(streams.iter_records(source, mimetype), chunk_size, reject)
+    click.echo('{0} assignments imported, {1} rejected'.format(imported, rejected))
+    if rejected:
+        raise SystemExit(1)
+
+
+# share of the seeded assignments in each state, and of the graded ones with each grade
+SEED_STATES = {AssignmentStateEnum.DRAFT: 0.2, AssignmentStateEnum.SUBMITTED: 0.3, AssignmentStateEnum.GRADED: 0.5}
+SEED_GRADES = {GradeEnum.A: 0.25, GradeEnum.B: 0.35, GradeEnum.C: 0.25, GradeEnum.D: 0.15}
+
+
+def _seed_rows(rng, now, first_user_id, first_student_id, first_teacher_id, students, teachers, assignments):
+    """(table, row generator) pairs of the seeded users, students, teachers and assignments, in insert order.
+    Ids are given explicitly, following the current max ids, so the rows can reference each other."""
+    def users():
+        for offset in range(students + teachers):
+            user_id = first_user_id + offset
+            username = 'seed_user_{0}'.format(user_id)
+            yield {'id': user_id, 'username': username, 'email': '{0}@fylebe.com'.format(username), 'created_at': now, 'updated_at': now}
+
+    def role_rows(first_id, count, first_user_offset):
+        for offset in range(count):
+            yield {'id': first_id + offset, 'user_id': first_user_id + first_user_offset + offset, 'created_at': now, 'updated_at': now}
+
+    def assignment_rows():
+        states, state_weights = list(SEED_STATES), list(accumulate(SEED_STATES.values()))
+        grades, grade_weights = list(SEED_GRADES), list(accumulate(SEED_GRADES.values()))
+        for number in range(assignments):
+            state = rng.choices(states, cum_weights=state_weights)[0]
+            created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            yield {
+                'student_id': first_student_id + rng.randrange(students),
+                'teacher_id': None if state is AssignmentStateEnum.DRAFT else first_teacher_id + rng.randrange(teachers),
+                'content': 'Seeded assignment {0}'.format(number),
+                'grade': rng.choices(grades, cum_weights=grade_weights)[0] if state is AssignmentStateEnum.GRADED else None,
+                'state': state,
+                'created_at': created_at,
+                'updated_at': created_at + timedelta(seconds=rng.randrange(30 * 24 * 3600)),
+            }
+
+    return [
+        (User.__table__, users()),
+        (Student.__table__, role_rows(first_student_id, students, 0)),
+        (Teacher.__table__, role_rows(first_teacher_id, teachers, students)),
+        (Assignment.__table__, assignment_rows()),
+    ]
+
+
+# flask seed --students 100000 --teachers 2000 --assignments 5000000
+@click.command('seed')
+@click.option('--students', type=click.IntRange(min=1), default=100, show_default=True)
+@click.option('--teachers', type=click.IntRange(min=1), default=10, show_default=True)
+@click.option('--assignments', type=click.IntRange(min=0), default=1000, show_default=True)
+@click.option('--seed', 'seed', type=int, default=0, show_default=True, help='The same seed on the same database generates the same rows.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=10000, show_default=True)
+@with_appcontext
+def seed_command(students, teachers, assignments, seed, batch_size):
+    """Adds synthetic users, students, teachers and assignments for benchmarks, in one transaction.
+    Running servers pick up the new principals once their directory expires (PRINCIPAL_DIRECTORY_TTL)."""
+    rng = random.Random(seed)
+    with db.engine.begin() as connection:
+        def next_id(model):
+            return connection.execute(select(func.coalesce(func.max(model.id), 0))).scalar() + 1
+
+        tables = _seed_rows(
+            rng, helpers.get_utc_now(), next_id(User), next_id(Student), next_id(Teacher), students, teachers, assignments
+        )
+        for table, rows in tables:
+            inserted = 0
+            for batch in streams.batches(rows, batch_size):
+                connection.execute(table.insert(), batch)
+                inserted += len(batch)
+            click.echo('{0}: {1} rows'.format(table.name, inserted))
+
+        # the explicit ids leave the id sequences behind on PostgreSQL, the next ORM insert would reuse one
+        if connection.dialect.name != 'sqlite':
+            for model in (User, Student, Teacher):
+                table = model.__table__
+                connection.execute(select(func.setval(
+                    func.pg_get_serial_sequence(table.name, 'id'), select(func.max(table.c.id)).scalar_subquery()
+                )))
+
+        # the Core inserts bypass the ORM events maintaining the counters
+        GradeStat.rebuild(connection)
+        click.echo('grade_stats rebuilt')
@@ -0,0 +1,62 @@
+import os
+
+
+# Reads the SQLite pragma overrides (e.g. SQLITE_BUSY_TIMEOUT=10000) from the environment
+def _sqlite_pragmas_from_env():
+    pragmas = {}
+    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store'):
+        value = os.environ.get('SQLITE_{0}'.format(name.upper()))
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+
+class Config:
+    # sets up the database URI, SQLite file next to the app unless DATABASE_URL is set
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///./store.sqlite3')
+    # database of the read-only routes (decorators.read_only), e.g. a replica. By default the SQLite file above opened
+    # read-only, or the primary itself on other backends
+    DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+    # seconds a client that wrote reads from the primary (read your writes), for replicas that lag. 0 switches it off,
+    # a read-only SQLite connection sees every commit already
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 0))
+    # if True, SQLAlchemy will log all the raw SQL statements
+    SQLALCHEMY_ECHO = False
+    # Disables tracking
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # connection pool of the app's engine: connections kept open, extra ones opened past that under load, seconds a
+    # request waits for a connection, and (server databases) seconds after which a connection is replaced and whether
+    # it is checked before use. DB_POOL_SIZE=0 opens a connection per checkout, SQLite only.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+
+    # pragmas applied to every SQLite connection, see core/libs/sqlite.py for the profiles
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    SQLITE_PRAGMAS = _sqlite_pragmas_from_env()
+
+    # seconds the in-memory student / teacher / principal ids used by authenticate_principal are trusted
+    PRINCIPAL_DIRECTORY_TTL = int(os.environ.get('PRINCIPAL_DIRECTORY_TTL', 60))
+    # seconds the serialized teacher list of GET /principal/teachers is served from memory, 0 disables the snapshot.
+    # Teacher writes in this process refresh it right away, writes in other workers after at most this long.
+    TEACHERS_SNAPSHOT_TTL = int(os.environ.get('TEACHERS_SNAPSHOT_TTL', 60))
+
+    # records below this level are dropped before they are formatted, see core/libs/log.py
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    # share of the per-request access lines that are written, e.g. 0.05 on busy servers
+    LOG_ACCESS_SAMPLE_RATE = float(os.environ.get('LOG_ACCESS_SAMPLE_RATE', 1.0))
+    # records waiting for the writer thread, more are dropped rather than blocking the request
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+    # database of the async app (core/asgi), by default SQLALCHEMY_DATABASE_URI with its async driver (aiosqlite, asyncpg)
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    # connections the async app keeps open, requests beyond that wait for one
+    ASYNC_POOL_SIZE = int(os.environ.get('ASYNC_POOL_SIZE', 10))
+
+    # rows of an assignments import validated, inserted and committed together
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+    # invalid rows listed in the response of POST /principal/assignments/import, the rest are only counted
+    IMPORT_MAX_REJECTS = int(os.environ.get('IMPORT_MAX_REJECTS', 100))
@@ -0,0 +1,87 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class RefreshingCache:
+    """Holds the value returned by `loader`, reloaded when it is older than `ttl` seconds or after invalidate().
+    `generation` is bumped by every invalidate(), `hits` / `misses` count the get() calls served from memory / loaded."""
+
+    def __init__(self, loader, ttl):
+        self._loader = loader
+        self._ttl = ttl
+        self._value = None
+        self._loaded_at = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl
+
+    # True while get() answers from memory, async callers load it off the event loop otherwise
+    def is_fresh(self):
+        return self._is_fresh()
+
+    # the value while it is fresh, else `default`, never loading it (async callers, which load it off the event loop)
+    def get_if_fresh(self, default=None):
+        if self._is_fresh():
+            self.hits += 1
+            return self._value
+        return default
+
+    def get(self):
+        if self._is_fresh():
+            self.hits += 1
+            return self._value
+
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._value
+
+            self.misses += 1
+            generation = self._generation
+            loaded_at = time.monotonic()
+            self._value = self._loader()
+            # an invalidate() during the load means the value may already be stale
+            self._loaded_at = loaded_at if generation == self._generation else None
+            return self._value
+
+    def invalidate(self):
+        self._generation += 1
+        self._loaded_at = None
+
+
+# (tables, cache) pairs: the cache is invalidated once a transaction that wrote to one of the tables commits
+_invalidated_by_tables = []
+_PENDING_INVALIDATIONS = 'pending_cache_invalidations'
+
+
+def invalidate_on_commit(cache, tables):
+    _invalidated_by_tables.append((frozenset(tables), cache))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_invalidations(session, flush_context):
+    written = {getattr(obj, '__tablename__', None) for obj in (*session.new, *session.dirty, *session.deleted)}
+    for tables, cache in _invalidated_by_tables:
+        if tables & written:
+            session.info.setdefault(_PENDING_INVALIDATIONS, []).append(cache)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_caches(session):
+    for cache in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_invalidations(session):
+    session.info.pop(_PENDING_INVALIDATIONS, None)
@@ -0,0 +1,71 @@
+import threading
+from flask import Flask
+from flask.cli import AppGroup
+from werkzeug.routing import Map
+from werkzeug.utils import import_string
+
+
+class LazyAppGroup(AppGroup):
+    """app.cli with commands given by import string ('module:command'), imported when they are listed or run"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = {}
+
+    def add_lazy_command(self, name, import_name):
+        self.lazy_commands[name] = import_name
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, name):
+        if name in self.lazy_commands:
+            self.add_command(import_string(self.lazy_commands.pop(name)), name)
+        return super().get_command(ctx, name)
+
+
+class LazyMap(Map):
+    """URL map calling `load()` before its URLs are matched, built (bind, bind_to_environ) or listed (iter_rules)"""
+
+    load = None
+
+    def bind(self, *args, **kwargs):
+        self.load()
+        return super().bind(*args, **kwargs)
+
+    # calls Map.bind, not self.bind
+    def bind_to_environ(self, *args, **kwargs):
+        self.load()
+        return super().bind_to_environ(*args, **kwargs)
+
+    def iter_rules(self, endpoint=None):
+        self.load()
+        return super().iter_rules(endpoint)
+
+
+class LazyFlask(Flask):
+    """Flask app whose blueprints, given by import string, are imported and registered when its URL map is first
+    used, i.e. by its first request. Creating the app (CLI commands, the gunicorn master, tests) then skips the views,
+    their schemas and marshmallow; `load_blueprints()` registers them ahead, e.g. before forking workers."""
+
+    url_map_class = LazyMap
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url_map.load = self.load_blueprints
+        self.cli = LazyAppGroup(name=self.name)
+        # (import name, register_blueprint options) of the blueprints not registered yet
+        self._lazy_blueprints = []
+        self._lazy_blueprints_lock = threading.Lock()
+
+    def register_lazy_blueprint(self, import_name, **options):
+        self._lazy_blueprints.append((import_name, options))
+
+    def load_blueprints(self):
+        if not self._lazy_blueprints:
+            return
+        with self._lazy_blueprints_lock:
+            for import_name, options in self._lazy_blueprints:
+                self.register_blueprint(import_string(import_name), **options)
+            # emptied once every blueprint is registered, so the requests checking it without the lock match them all
+            self._lazy_blueprints = []
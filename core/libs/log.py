@@ -0,0 +1,158 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# attributes every LogRecord has, anything else was passed through `extra` and is written as a field of the line
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id', 'sample_rate'}
+
+# the thread writing the queued records, one per process however many apps are set up, and the handler feeding it
+_listener = None
+_queue_handler = None
+
+# id of the request served by the async app (core/asgi), which has no Flask request context
+current_request_id = contextvars.ContextVar('current_request_id', default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id and the `extra` fields of the call"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a record logged with extra={'sample_rate': r} with probability r, for high-volume messages"""
+
+    def filter(self, record):
+        sample_rate = getattr(record, 'sample_rate', 1)
+        return sample_rate >= 1 or random.random() < sample_rate
+
+
+class RequestIdFilter(logging.Filter):
+    """Tags records with the id of the request being served, so all the lines of a request can be found together"""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else current_request_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread, dropping them when the queue is full instead of waiting on it"""
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # the message and traceback are rendered here, as the objects they refer to may change once the request moves on
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def make_queue_handler(record_queue):
+    handler = NonBlockingQueueHandler(record_queue)
+    handler.addFilter(SamplingFilter())
+    handler.addFilter(RequestIdFilter())
+    return handler
+
+
+def request_id_of(headers):
+    return headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+
+# the access line of a served request, `started` being its time.perf_counter() at the start
+def log_request(logger, method, path, status, started, sample_rate):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('request', extra={
+            'method': method,
+            'path': path,
+            'status': status,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'sample_rate': sample_rate,
+        })
+
+
+def _start_request():
+    g.request_id = request_id_of(request.headers)
+    g.request_started = time.perf_counter()
+
+
+def _start_listener(*handlers):
+    global _listener
+
+    _listener = QueueListener(_queue_handler.queue, *handlers)
+    _listener.start()
+    # writes out what is still queued when the process exits
+    atexit.register(_listener.stop)
+
+
+def after_fork():
+    """Starts a writer thread in a forked process (a gunicorn worker of a preloaded app), as only the forking
+    thread survives fork(). The process gets a new queue too, the parent's writer may have held its lock."""
+    if _listener is None:
+        return
+
+    atexit.unregister(_listener.stop)
+    _queue_handler.queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _start_listener(*_listener.handlers)
+
+
+def init_app(app):
+    """Sends the app's log records (the `core` logger and its children) through a queue to a background thread
+    writing JSON lines to stdout, so request threads never wait on the output. Every response gets an X-Request-Id."""
+    global _queue_handler
+
+    logger = logging.getLogger(app.import_name)
+    logger.setLevel(app.config['LOG_LEVEL'])
+    logger.propagate = False
+
+    if _listener is None:
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter())
+        _queue_handler = make_queue_handler(queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE']))
+        logger.addHandler(_queue_handler)
+        _start_listener(output)
+
+    access_sample_rate = app.config['LOG_ACCESS_SAMPLE_RATE']
+
+    def end_request(response):
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        log_request(logger, request.method, request.path, response.status_code, g.request_started, access_sample_rate)
+        return response
+
+    app.before_request(_start_request)
+    app.after_request(end_request)
@@ -0,0 +1,109 @@
+import contextvars
+import os
+import time
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+# Metrics are labelled by Flask endpoint (blueprint.view), '' for requests that matched no route and 'none' for SQL run
+# outside a request (CLI commands, migrations). Under gunicorn set PROMETHEUS_MULTIPROC_DIR so every worker writes
+# its samples there and /metrics adds them up, see the README.
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent serving a request', ['endpoint', 'method']
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests served', ['endpoint', 'method', 'status']
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of the response body, streamed responses excluded', ['endpoint'],
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000, float('inf'))
+)
+ERRORS = Counter(
+    'http_errors_total', 'Errors turned into a response by the error handler', ['error', 'status']
+)
+SQL_STATEMENTS = Counter(
+    'db_statements_total', 'SQL statements executed', ['endpoint']
+)
+SQL_SECONDS = Counter(
+    'db_statement_seconds_total', 'Time spent executing SQL statements', ['endpoint']
+)
+SQL_STATEMENTS_PER_REQUEST = Histogram(
+    'db_statements_per_request', 'SQL statements executed while serving one request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float('inf'))
+)
+
+
+# endpoint and statement count of the request served by the async app (core/asgi), which has no Flask request context
+current_endpoint = contextvars.ContextVar('current_endpoint', default=None)
+current_sql_statements = contextvars.ContextVar('current_sql_statements', default=None)
+
+
+def _endpoint():
+    if not has_request_context():
+        return current_endpoint.get() or 'none'
+    return request.endpoint or ''
+
+
+# the start time is kept on the execution context, so a failed statement leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.metrics_started
+    endpoint = _endpoint()
+    SQL_STATEMENTS.labels(endpoint).inc()
+    SQL_SECONDS.labels(endpoint).inc(elapsed)
+    if has_request_context():
+        g.sql_statements = g.get('sql_statements', 0) + 1
+    elif current_sql_statements.get() is not None:
+        current_sql_statements.get()[0] += 1
+
+
+def install_sql_metrics(engine):
+    """Counts the statements run on `engine` and the time they take"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    return engine
+
+
+def count_error(err, status):
+    ERRORS.labels(err.__class__.__name__, status).inc()
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+# `size` is None for a streamed response, `started` the time.perf_counter() at the start of the request
+def observe_request(endpoint, method, status, started, size, sql_statements):
+    REQUEST_LATENCY.labels(endpoint, method).observe(time.perf_counter() - started)
+    REQUESTS.labels(endpoint, method, status).inc()
+    SQL_STATEMENTS_PER_REQUEST.labels(endpoint).observe(sql_statements)
+    if size is not None:
+        RESPONSE_SIZE.labels(endpoint).observe(size)
+
+
+def _end_request(response):
+    observe_request(
+        _endpoint(), request.method, response.status_code, g.metrics_started,
+        None if response.is_streamed else response.calculate_content_length() or 0, g.get('sql_statements', 0)
+    )
+    return response
+
+
+def metrics():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+
+def init_app(app):
+    """Records the request metrics of `app` and serves them at /metrics in the Prometheus text format"""
+    app.before_request(_start_request)
+    app.after_request(_end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
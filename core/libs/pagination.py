@@ -0,0 +1,67 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from . import assertions
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+# The cursor is the (updated_at, id) of the last row of a page, base64 encoded so clients treat it as opaque
+def encode_cursor(updated_at, _id):
+    payload = json.dumps([updated_at.isoformat(), _id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, _id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(updated_at), int(_id)
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        assertions.assert_valid(False, 'invalid cursor')
+
+
+# Reads and validates the limit and cursor query params of a list endpoint
+def get_page_args(args):
+    limit = args.get('limit', DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        assertions.assert_valid(False, 'limit should be an integer')
+
+    assertions.assert_valid(0 < limit <= MAX_PAGE_SIZE, 'limit should be between 1 and {0}'.format(MAX_PAGE_SIZE))
+
+    cursor = args.get('cursor') or None
+    return limit, cursor
+
+
+# Restricts a query to the rows after the cursor, ordered by (updated_at, id).
+# One extra row is fetched so we know whether there is a next page without a count query.
+def keyset_query(query, updated_col, id_col, limit, cursor=None):
+    if cursor is not None:
+        updated_at, _id = decode_cursor(cursor)
+        query = query.filter(or_(
+            updated_col > updated_at,
+            and_(updated_col == updated_at, id_col > _id)
+        ))
+
+    return query.order_by(updated_col, id_col).limit(limit + 1)
+
+
+def keyset_page(query, updated_col, id_col, limit, cursor=None):
+    rows = keyset_query(query, updated_col, id_col, limit, cursor).all()
+    return page_of(rows, updated_col, id_col, limit)
+
+
+# Splits the rows fetched by keyset_query into the page and the cursor of the next page (None on the last page)
+def page_of(rows, updated_col, id_col, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(getattr(last_row, updated_col.key), getattr(last_row, id_col.key))
+
+    return rows, next_cursor
@@ -0,0 +1,23 @@
+from sqlalchemy.pool import QueuePool
+
+
+def pool_options(config, url):
+    """create_engine() options pooling the connections to `url` as the DB_POOL_* settings of `config` say"""
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+
+    if url.get_backend_name() != 'sqlite':
+        # replaces connections before a server or proxy drops them for being idle, and those it dropped anyway
+        options.update(pool_recycle=config['DB_POOL_RECYCLE'], pool_pre_ping=config['DB_POOL_PRE_PING'])
+        return options
+
+    # in-memory databases get a single shared connection from Flask-SQLAlchemy, DB_POOL_SIZE=0 none kept open
+    if not config['DB_POOL_SIZE'] or url.database in (None, '', ':memory:'):
+        return {}
+    # SQLAlchemy opens a connection per checkout for SQLite files. Kept open, a connection keeps its page cache
+    # and pragmas, and it is used by one thread at a time though not always the one that opened it
+    options.update(poolclass=QueuePool, connect_args={'check_same_thread': False})
+    return options
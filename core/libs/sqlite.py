@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# 'default' only enforces fk (not done by default in sqlite3).
+# 'production' lets readers run alongside a writer (WAL) and makes writers wait for the lock instead of failing
+# with "database is locked" when several gunicorn workers share the file.
+SQLITE_PROFILES = {
+    'default': {
+        'foreign_keys': 'ON',
+    },
+    'production': {
+        'foreign_keys': 'ON',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def get_pragmas(profile='production', overrides=None):
+    assert profile in SQLITE_PROFILES, 'unknown SQLite profile {0!r}'.format(profile)
+    pragmas = dict(SQLITE_PROFILES[profile])
+    pragmas.update(overrides or {})
+    return pragmas
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute('PRAGMA {0}={1};'.format(name, value))
+    cursor.close()
+
+
+# Applies the pragmas whenever the engine opens a new DBAPI connection
+def install_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+    return engine
+
+
+# Rejects writes on `connection` while the block runs, for long reads such as exports. No-op on other databases.
+@contextmanager
+def read_only(connection):
+    if connection.dialect.name != 'sqlite':
+        yield connection
+        return
+
+    connection.exec_driver_sql('PRAGMA query_only = ON')
+    try:
+        yield connection
+    finally:
+        # the connection goes back to the pool, where writers will pick it up
+        connection.exec_driver_sql('PRAGMA query_only = OFF')
@@ -0,0 +1,41 @@
+import csv
+import json
+
+CSV_MIMETYPE = 'text/csv'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def batches(iterable, size):
+    """Lists of up to `size` items of `iterable`, read lazily so only one batch is in memory"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# CSV rows as dicts keyed by the header line, empty cells left out so they read as missing
+def iter_csv(lines):
+    for row in csv.DictReader(lines):
+        yield {key: value for key, value in row.items() if key is not None and value not in ('', None)}
+
+
+# One JSON value per line, blank lines skipped. A line that is not valid JSON is yielded as its text,
+# so it is rejected by validation like any other bad record instead of stopping the stream.
+def iter_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line.rstrip('\n')
+
+
+def iter_records(lines, mimetype):
+    if mimetype == CSV_MIMETYPE:
+        return iter_csv(lines)
+    return iter_ndjson(lines)
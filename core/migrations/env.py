@@ -69,6 +69,12 @@ def run_migrations_online():
 
     #  Establishes a database connection for migration.
     with connectable.connect() as connection:
+        # The seed data of the migrations is written with db.session, bound to this connection so it is part of the
+        # migration's transaction: on PostgreSQL, where DDL is transactional, another connection would not see the tables yet.
+        db = current_app.extensions['migrate'].db
+        db.session.remove()
+        db.session.configure(bind=connection, binds={})
+
         # Configures Alembic with the database connection and model metadata.
         context.configure(
             connection=connection,
@@ -81,6 +87,11 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+# Seed data written by the migrations does not maintain the grade stats counters, the grade_stats migration
+# rebuilds them from the assignments table instead.
+from core.models.grade_stats import GradeStat
+GradeStat.tracking = False
+
 # Depending on the mode, it runs the appropriate migration function.
 if context.is_offline_mode():
     run_migrations_offline()
@@ -8,7 +8,6 @@ Create Date: 2021-09-16 10:11:14.484440
 from alembic import op
 import sqlalchemy as sa
 from core import db
-from core.apis.decorators import AuthPrincipal
 from core.models.users import User
 from core.models.students import Student
 from core.models.teachers import Teacher
@@ -45,7 +44,7 @@ def upgrade():
     sa.Column('teacher_id', sa.Integer(), nullable=True),
     sa.Column('content', sa.Text(), nullable=True),
     sa.Column('grade', sa.Enum('A', 'B', 'C', 'D', name='gradeenum'), nullable=True),
-    sa.Column('state', sa.Enum('DRAFT', 'SUBMITTED', name='assignmentstateenum'), nullable=True),
+    sa.Column('state', sa.Enum('DRAFT', 'SUBMITTED', 'GRADED', name='assignmentstateenum'), nullable=True),
     sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
     sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
     sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
@@ -80,23 +79,12 @@ def upgrade():
 
     db.session.flush()
 
-    Assignment.submit(
-        _id=assignment_1.id,
-        teacher_id=teacher_1.id,
-        auth_principal=AuthPrincipal(user_id=student_1.user_id, student_id=student_1.id)
-    )
-
-    Assignment.submit(
-        _id=assignment_3.id,
-        teacher_id=teacher_2.id,
-        auth_principal=AuthPrincipal(user_id=student_2.user_id, student_id=student_2.id)
-    )
-
-    Assignment.submit(
-        _id=assignment_4.id,
-        teacher_id=teacher_2.id,
-        auth_principal=AuthPrincipal(user_id=student_2.user_id, student_id=student_2.id)
-    )
+    # the submissions are written as they were when this migration was made, Assignment.submit has since gained
+    # checks (assignment_4 is already graded) that need tables created by later migrations
+    for assignment, teacher in ((assignment_1, teacher_1), (assignment_3, teacher_2), (assignment_4, teacher_2)):
+        assignment.teacher_id = teacher.id
+        assignment.state = AssignmentStateEnum.SUBMITTED
+    db.session.flush()
 
     db.session.commit()
     # ### end Alembic commands ###
@@ -107,4 +95,7 @@ def downgrade():
     op.drop_table('assignments')
     op.drop_table('teachers')
     op.drop_table('students')
+    # the enum types PostgreSQL created with the table (no-op on SQLite)
+    sa.Enum(name='assignmentstateenum').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='gradeenum').drop(op.get_bind(), checkfirst=True)
     # ### end Alembic commands ###
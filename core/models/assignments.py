@@ -1,11 +1,16 @@
 import enum
 from core import db
-from core.apis.decorators import AuthPrincipal
-from core.libs import helpers, assertions
+from core.apis.decorators import AuthPrincipal, principal_directory
+from core.libs import helpers, assertions, pagination
 from core.models.teachers import Teacher
 from core.models.students import Student
+from core.models.grade_stats import GradeStat
+from core.libs.exceptions import FyleError
 from sqlalchemy.types import Enum as BaseEnum
-from sqlalchemy import or_
+from sqlalchemy import and_, case, event, false, func, inspect, or_, select
+
+# most assignments a bulk request may change at once
+MAX_BULK_SIZE = 1000
 
 class GradeEnum(str, enum.Enum):
     A = 'A'
@@ -30,6 +35,17 @@ class Assignment(db.Model):
     state = db.Column(BaseEnum(AssignmentStateEnum), default=AssignmentStateEnum.DRAFT, nullable=False)
     created_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False)
     updated_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False, onupdate=helpers.get_utc_now)
+    # bumped by every UPDATE below, so an edit can require the version the client last read (see upsert)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    # keep in sync with migration 9c1f3a7d2b64, tests/query_plan_test.py fails if a query stops using them
+    __table_args__ = (
+        db.Index('ix_assignments_student_id_updated_at', 'student_id', 'updated_at', 'id'),
+        db.Index('ix_assignments_teacher_id_state_updated_at', 'teacher_id', 'state', 'updated_at', 'id'),
+        db.Index('ix_assignments_state_updated_at', 'state', 'updated_at', 'id'),
+        db.Index('ix_assignments_state_teacher_id_grade', 'state', 'teacher_id', 'grade'),
+        db.Index('ix_assignments_state_student_id', 'state', 'student_id'),
+    )
 
     def __repr__(self):
         return '<Assignment %r>' % self.id
@@ -42,79 +58,368 @@ class Assignment(db.Model):
     #     fields = {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
     #     return str(fields)
 
+    # (student_id, teacher_id, state, grade) of an assignment or row, as counted by GradeStat
+    @staticmethod
+    def stat_key(row):
+        return (
+            row.student_id, row.teacher_id,
+            getattr(row.state, 'value', row.state), getattr(row.grade, 'value', row.grade)
+        )
+
+    # `session` defaults to the request's db.session, the async routes pass the sync facade of their AsyncSession
     @classmethod
-    def filter(cls, *criterion):
-        db_query = db.session.query(cls)
+    def filter(cls, *criterion, session=None):
+        db_query = (db.session if session is None else session).query(cls)
         return db_query.filter(*criterion)
 
     @classmethod
-    def get_by_id(cls, _id):
-        return cls.filter(cls.id == _id).first()
+    def get_by_id(cls, _id, session=None):
+        return cls.filter(cls.id == _id, session=session).first()
 
+    # Applies `values` to assignment `_id` with one UPDATE that only matches while `guard` holds, so two concurrent
+    # requests cannot both make the transition. The row is read back once on success, and on failure only to tell
+    # why with get_error(assignment). The ORM events do not see the UPDATE, grade_stats is kept up to date here.
     @classmethod
-    def upsert(cls, assignment_new: 'Assignment'):
-        if assignment_new.id is not None:
-            assignment = Assignment.get_by_id(assignment_new.id)
-            assertions.assert_found(assignment, 'No assignment with this id was found')
-            assertions.assert_valid(assignment.state == AssignmentStateEnum.DRAFT,
-                                    'only assignment in draft state can be edited')
+    def _transition(cls, _id, values, guard, get_error, session=None):
+        session = db.session if session is None else session
+        criterion = and_(cls.id == _id, *guard)
+        connection = session.connection()
+        counted = any(column.key in STAT_ATTRIBUTES for column in values)
 
-            assignment.content = assignment_new.content
-        else:
-            assignment = assignment_new
-            db.session.add(assignment_new)
+        if counted:
+            GradeStat.retract(connection, criterion)
+        updated = cls.filter(criterion, session=session).update(
+            {**values, cls.version: cls.version + 1}, synchronize_session=False
+        )
+        if updated == 0:
+            # None only when the row changed since the UPDATE, which a concurrent request did
+            raise get_error(cls.get_by_id(_id, session)) or FyleError(409, 'assignment was changed by another request')
 
-        db.session.flush()
+        assignment = cls.filter(cls.id == _id, session=session).populate_existing().one()
+        if counted:
+            GradeStat.record(connection, [(None, cls.stat_key(assignment))])
         return assignment
 
     @classmethod
-    def submit(cls, _id, teacher_id, auth_principal: AuthPrincipal):
-        assignment = Assignment.get_by_id(_id)
-        assertions.assert_found(assignment, 'No assignment with this id was found')
-        assertions.assert_valid(assignment.student_id == auth_principal.student_id, 'This assignment belongs to some other student')
-        assertions.assert_valid(assignment.content is not None, 'assignment with empty content cannot be submitted')
+    def upsert(cls, assignment_new: 'Assignment', versions=None, session=None):
+        """Creates a draft, or edits the content of the student's draft with id assignment_new.id. When `versions`
+        is given the edit only applies if the current version is one of them, else it fails with a 409."""
+        if assignment_new.id is None:
+            session = db.session if session is None else session
+            assignment_new.version = 1
+            session.add(assignment_new)
+            session.flush()
+            return assignment_new
 
-        assignment.teacher_id = teacher_id
-        assignment.state = AssignmentStateEnum.SUBMITTED
-        db.session.flush()
+        guard = [cls.student_id == assignment_new.student_id, cls.state == AssignmentStateEnum.DRAFT]
+        if versions is not None:
+            guard.append(cls.version.in_(versions))
 
-        # No need for flush() if committing is handled elsewhere
+        return cls._transition(assignment_new.id, {
+            cls.content: assignment_new.content,
+            cls.updated_at: helpers.get_utc_now(),
+        }, guard, lambda assignment: cls.edit_error(assignment, assignment_new.student_id, versions), session)
 
-        return assignment
+    # `teacher_ids` defaults to those of the principal directory, the async routes pass the ones they loaded off the
+    # event loop, where the directory must not be reloaded
+    @classmethod
+    def submit(cls, _id, teacher_id, auth_principal: AuthPrincipal, session=None, teacher_ids=None):
+        if teacher_ids is None:
+            teacher_ids = principal_directory.get()['teacher_id']
+        guard = [
+            cls.student_id == auth_principal.student_id,
+            cls.state == AssignmentStateEnum.DRAFT,
+            cls.content.isnot(None),
+            cls.content != '',
+        ]
+        if teacher_id not in teacher_ids:
+            guard.append(false())
 
+        return cls._transition(_id, {
+            cls.teacher_id: teacher_id,
+            cls.state: AssignmentStateEnum.SUBMITTED,
+            cls.updated_at: helpers.get_utc_now(),
+        }, guard, lambda assignment: cls.submission_error(assignment, teacher_id, auth_principal, teacher_ids), session)
 
     @classmethod
-    def mark_grade(cls, _id, grade, auth_principal: AuthPrincipal):
-        assignment = Assignment.get_by_id(_id)
-        assertions.assert_found(assignment, 'No assignment with this id was found')
+    def mark_grade(cls, _id, grade, auth_principal: AuthPrincipal, session=None):
         assertions.assert_valid(grade is not None, 'assignment with empty grade cannot be graded')
 
-        assignment.grade = grade
-        assignment.state = AssignmentStateEnum.GRADED
-        db.session.flush()
+        guard = [cls.state != AssignmentStateEnum.DRAFT]
+        if auth_principal.principal_id is None:
+            guard.append(cls.teacher_id == auth_principal.teacher_id)
 
-        return assignment
+        return cls._transition(_id, {
+            cls.grade: grade,
+            cls.state: AssignmentStateEnum.GRADED,
+            cls.updated_at: helpers.get_utc_now(),
+        }, guard, lambda assignment: cls.grading_error(assignment, auth_principal), session)
+
+    # Returns why the student cannot edit this assignment when the current version is not one of `versions` (a FyleError) or None
+    @classmethod
+    def edit_error(cls, assignment, student_id, versions=None):
+        if assignment is None:
+            return FyleError(404, 'No assignment with this id was found')
+        if assignment.student_id != student_id:
+            return FyleError(400, 'This assignment belongs to some other student')
+        if assignment.state != AssignmentStateEnum.DRAFT:
+            return FyleError(400, 'only assignment in draft state can be edited')
+        if versions is not None and assignment.version not in versions:
+            return FyleError(409, 'assignment was changed by another request, the current version is {0}'.format(
+                assignment.version
+            ))
+        return None
+
+    # Returns why the principal cannot grade this assignment (a FyleError) or None
+    @classmethod
+    def grading_error(cls, assignment, auth_principal: AuthPrincipal):
+        if assignment is None:
+            return FyleError(404, 'No assignment with this id was found')
+        if assignment.state == AssignmentStateEnum.DRAFT and auth_principal.principal_id is not None:
+            return FyleError(400, 'Assignments in draft state cannot be graded')
+        if assignment.state == AssignmentStateEnum.DRAFT:
+            return FyleError(400, 'Only a Submitted assignment can be given Grade.')
+        if auth_principal.principal_id is None and assignment.teacher_id != auth_principal.teacher_id:
+            return FyleError(400, 'You are not authorized to grade this assignment.')
+        return None
+
+    # Returns why the student cannot submit this assignment to the teacher (a FyleError) or None
+    @classmethod
+    def submission_error(cls, assignment, teacher_id, auth_principal: AuthPrincipal, teacher_ids=None):
+        if assignment is None:
+            return FyleError(404, 'No assignment with this id was found')
+        if assignment.student_id != auth_principal.student_id:
+            return FyleError(400, 'This assignment belongs to some other student')
+        if assignment.state != AssignmentStateEnum.DRAFT:
+            return FyleError(400, 'only a draft assignment can be submitted')
+        if not assignment.content:
+            return FyleError(400, 'assignment with empty content cannot be submitted')
+        if teacher_ids is None:
+            teacher_ids = principal_directory.get()['teacher_id']
+        if teacher_id not in teacher_ids:
+            return FyleError(400, 'No teacher with this id was found')
+        return None
+
+    # Validates a batch of (id, value) against the rows read with one SELECT of `columns`.
+    # Returns the (id, error) of every item and {id: value} of the items without error
+    @classmethod
+    def _check_batch(cls, items, columns, get_error):
+        assertions.assert_valid(0 < len(items) <= MAX_BULK_SIZE, 'between 1 and {0} assignments can be changed at once'.format(MAX_BULK_SIZE))
+
+        columns = (cls.student_id, cls.teacher_id, cls.state, cls.grade, cls.version, *columns)
+        current = {row.id: row for row in db.session.query(cls.id, *columns).filter(cls.id.in_([_id for _id, _ in items]))}
+
+        checked = []
+        seen = set()
+        valid = {}
+        for _id, value in items:
+            if _id in seen:
+                error = FyleError(400, 'assignment is repeated in the batch')
+            else:
+                seen.add(_id)
+                error = get_error(current.get(_id), value)
+                if error is None:
+                    valid[_id] = value
+            checked.append((_id, error))
+        return checked, valid, current
+
+    # Matches the rows of `ids` still at the version _check_batch read, i.e. not changed by another request since
+    @classmethod
+    def _unchanged_since_check(cls, current, ids):
+        if not ids:
+            return false()
+        return cls.version == case({_id: current[_id].version for _id in ids}, value=cls.id)
+
+    # Applies `values` to the valid rows matching `criterion` with one UPDATE, reloads the rows it changed with one
+    # SELECT, updates the grade stats and returns (id, assignment, error) for every item of the batch, in order.
+    # A valid row the UPDATE did not change was changed by another request after the check, it gets a 409.
+    @classmethod
+    def _apply_batch(cls, checked, valid, current, values, *criterion):
+        changed = {}
+        if valid:
+            cls.filter(cls.id.in_(valid), *criterion).update(
+                {**values, cls.version: cls.version + 1}, synchronize_session=False
+            )
+            # the version this UPDATE set and its timestamp, a concurrent change of the row may have the same version
+            changed = {
+                assignment.id: assignment
+                for assignment in cls.filter(
+                    cls.id.in_(valid),
+                    cls.version == case({_id: current[_id].version + 1 for _id in valid}, value=cls.id),
+                    cls.updated_at == values[cls.updated_at],
+                ).populate_existing()
+            }
+            GradeStat.record(db.session.connection(), [
+                (cls.stat_key(current[_id]), cls.stat_key(assignment)) for _id, assignment in changed.items()
+            ])
+
+        results = []
+        for _id, error in checked:
+            if error is None and _id not in changed:
+                error = FyleError(409, 'assignment was changed by another request')
+            results.append((_id, changed.get(_id) if error is None else None, error))
+        return results
+
+    @classmethod
+    def mark_grades(cls, grades, auth_principal: AuthPrincipal):
+        """Grades a batch of (id, grade) with one SELECT to validate, one UPDATE and one SELECT to return the rows"""
+        checked, grade_by_id, current = cls._check_batch(
+            grades, (),
+            lambda assignment, grade: cls.grading_error(assignment, auth_principal)
+        )
+        # a concurrent grade or regrade is not overwritten, nor its stats retracted from the checked counters
+        return cls._apply_batch(checked, grade_by_id, current, {
+            cls.grade: case(grade_by_id, value=cls.id, else_=cls.grade),
+            cls.state: AssignmentStateEnum.GRADED,
+            cls.updated_at: helpers.get_utc_now(),
+        }, cls.state != AssignmentStateEnum.DRAFT, cls._unchanged_since_check(current, grade_by_id))
+
+    @classmethod
+    def submit_many(cls, submissions, auth_principal: AuthPrincipal):
+        """Submits a batch of (id, teacher_id) with one SELECT to validate, one UPDATE and one SELECT to return the rows"""
+        checked, teacher_by_id, current = cls._check_batch(
+            submissions, (cls.content,),
+            lambda assignment, teacher_id: cls.submission_error(assignment, teacher_id, auth_principal)
+        )
+        # the version condition keeps a concurrent submit or edit from being overwritten or applied twice
+        return cls._apply_batch(checked, teacher_by_id, current, {
+            cls.teacher_id: case(teacher_by_id, value=cls.id, else_=cls.teacher_id),
+            cls.state: AssignmentStateEnum.SUBMITTED,
+            cls.updated_at: helpers.get_utc_now(),
+        }, cls.state == AssignmentStateEnum.DRAFT, cls._unchanged_since_check(current, teacher_by_id))
+
+    @classmethod
+    def insert_rows(cls, connection, rows):
+        """Inserts validated row dicts, all with the same keys, with one executemany. The ORM events do not see
+        Core inserts, so the rows are counted in grade_stats here."""
+        if not rows:
+            return
+        connection.execute(cls.__table__.insert(), rows)
+        GradeStat.record(connection, [(None, cls.stat_key(helpers.GeneralObject(**row))) for row in rows])
+
+    # Criteria of the assignments each kind of principal lists, for the queries below and the select() statements
+    # of the async routes (core/asgi)
+    @classmethod
+    def student_scope(cls, student_id):
+        return (cls.student_id == student_id,)
+
+    @classmethod
+    def teacher_scope(cls, teacher_id):
+        return (cls.teacher_id == teacher_id, cls.state.in_([AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED]))
+
+    @classmethod
+    def principal_scope(cls):
+        return (cls.state.in_([AssignmentStateEnum.GRADED, AssignmentStateEnum.SUBMITTED]),)
 
     @classmethod
-    def get_assignments_by_student(cls, student_id):
-        return cls.filter(cls.student_id == student_id).all()
+    def query_by_student(cls, student_id):
+        return cls.filter(*cls.student_scope(student_id))
 
     @classmethod
-    def get_assignments_by_teacher(cls, teacher_id):
-        # return cls.query.all()
-        # return cls.query.filter(cls.teacher_id == teacher_id ).all()
-        return cls.query.filter(
-            cls.teacher_id == teacher_id,
-            cls.state.in_(['SUBMITTED', 'GRADED'])
-        ).all()
-    
+    def query_by_teacher(cls, teacher_id):
+        return cls.filter(*cls.teacher_scope(teacher_id))
 
     @classmethod
-    def get_assignments_by_principal(cls):
-        # return cls.filter(cls.state == AssignmentStateEnum.GRADED or cls.grade == AssignmentStateEnum.SUBMITTED).all()
-        return cls.query.filter(cls.state.in_([AssignmentStateEnum.GRADED, AssignmentStateEnum.SUBMITTED])).all()
-        # return cls.query.filter(or_(
-        #         cls.state == AssignmentStateEnum.GRADED,
-        #         cls.state == AssignmentStateEnum.SUBMITTED
-        #     )).all()
+    def query_by_principal(cls):
+        return cls.filter(*cls.principal_scope())
+
+    # Narrows `query` to the given state / grade / teacher, a None filter being left out
+    @classmethod
+    def apply_filters(cls, query, state=None, grade=None, teacher_id=None):
+        if state is not None:
+            query = query.filter(cls.state == state)
+        if grade is not None:
+            query = query.filter(cls.grade == grade)
+        if teacher_id is not None:
+            query = query.filter(cls.teacher_id == teacher_id)
+        return query
+
+    # (row count, max updated_at) of the query, changes whenever a row of the scope is added, edited or removed from it
+    @classmethod
+    def fingerprint_query(cls, query):
+        return query.with_entities(func.count(cls.id), func.max(cls.updated_at))
+
+    @classmethod
+    def get_fingerprint(cls, query):
+        return tuple(cls.fingerprint_query(query).one())
+
+    # fingerprint_query as a select() of the rows matching `scope`
+    @classmethod
+    def fingerprint_statement(cls, scope):
+        return select(func.count(cls.id), func.max(cls.updated_at)).where(*scope)
+
+    # Iterates over every row of the query, fetching batch_size rows at a time from a server-side cursor
+    @classmethod
+    def iter_all(cls, query, batch_size=500):
+        return query.order_by(cls.updated_at, cls.id).yield_per(batch_size)
+
+    # (state, updated_at, id) is the order of the state and teacher indexes, so SQLite streams the rows
+    # straight from the index instead of sorting the whole result first
+    @classmethod
+    def export_query(cls, query):
+        return query.order_by(cls.state, cls.updated_at, cls.id)
+
+    # Plain rows of `query` in export order, fetched `batch_size` at a time from a server-side cursor on `connection`,
+    # without building ORM objects
+    @classmethod
+    def iter_rows(cls, connection, query, batch_size=1000):
+        result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+            cls.export_query(query).statement
+        )
+        for partition in result.partitions(batch_size):
+            yield from partition
+
+    # Returns one page of assignments and the cursor of the next page (None on the last page)
+    @classmethod
+    def get_page(cls, query, limit=pagination.DEFAULT_PAGE_SIZE, cursor=None):
+        return pagination.keyset_page(query, cls.updated_at, cls.id, limit, cursor)
+
+    @classmethod
+    def get_assignments_by_student(cls, student_id, limit=pagination.DEFAULT_PAGE_SIZE, cursor=None):
+        return cls.get_page(cls.query_by_student(student_id), limit, cursor)
+
+    @classmethod
+    def get_assignments_by_teacher(cls, teacher_id, limit=pagination.DEFAULT_PAGE_SIZE, cursor=None):
+        return cls.get_page(cls.query_by_teacher(teacher_id), limit, cursor)
+
+    @classmethod
+    def get_assignments_by_principal(cls, limit=pagination.DEFAULT_PAGE_SIZE, cursor=None):
+        return cls.get_page(cls.query_by_principal(), limit, cursor)
+
+
+# Keeps grade_stats in step with every insert / update / delete flushed through the ORM, in the same transaction.
+# Bulk UPDATE statements bypass these events and call GradeStat.record themselves.
+STAT_ATTRIBUTES = ('student_id', 'teacher_id', 'state', 'grade')
+
+for _attribute in STAT_ATTRIBUTES:
+    # loads the previous value when the attribute is set, so we know which counters to decrement
+    event.listen(getattr(Assignment, _attribute), 'set', lambda *args: None, active_history=True)
+
+
+def _previous_stat_key(target):
+    attrs = inspect(target).attrs
+    values = {}
+    for name in STAT_ATTRIBUTES:
+        history = attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = None
+    return Assignment.stat_key(helpers.GeneralObject(**values))
+
+
+@event.listens_for(Assignment, 'after_insert')
+def _count_inserted_assignment(mapper, connection, target):
+    GradeStat.record(connection, [(None, Assignment.stat_key(target))])
+
+
+@event.listens_for(Assignment, 'after_update')
+def _count_updated_assignment(mapper, connection, target):
+    GradeStat.record(connection, [(_previous_stat_key(target), Assignment.stat_key(target))])
+
 
+@event.listens_for(Assignment, 'after_delete')
+def _count_deleted_assignment(mapper, connection, target):
+    GradeStat.record(connection, [(_previous_stat_key(target), None)])
@@ -0,0 +1,208 @@
+from collections import Counter, defaultdict
+from core import db
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+GRADES = ('A', 'B', 'C', 'D')
+COUNTERS = ('total',) + tuple('grade_{0}'.format(grade.lower()) for grade in GRADES)
+
+
+class GradeStat(db.Model):
+    """Assignment counters per teacher and per student, by state and grade, maintained in the same transaction
+    as the assignment writes so the grading reports never scan the assignments table."""
+    __tablename__ = 'grade_stats'
+    owner_type = db.Column(db.String(16), primary_key=True)  # 'teacher' or 'student'
+    owner_id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.String(16), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    grade_a = db.Column(db.Integer, nullable=False, default=0)
+    grade_b = db.Column(db.Integer, nullable=False, default=0)
+    grade_c = db.Column(db.Integer, nullable=False, default=0)
+    grade_d = db.Column(db.Integer, nullable=False, default=0)
+
+    # switched off while migrations run (the table may not exist yet), migration d41b7c8e9f02 rebuilds it
+    tracking = True
+
+    __table_args__ = (
+        db.Index('ix_grade_stats_owner_type_state_total', 'owner_type', 'state', 'total', 'owner_id'),
+    )
+
+    def __repr__(self):
+        return '<GradeStat %r %r %r>' % (self.owner_type, self.owner_id, self.state)
+
+    # counters an assignment adds to the stats, `key` being its (student_id, teacher_id, state, grade)
+    @staticmethod
+    def _contributions(key):
+        student_id, teacher_id, state, grade = key
+        counters = Counter(total=1)
+        if grade is not None:
+            counters['grade_{0}'.format(grade.lower())] = 1
+
+        owners = [('student', student_id)]
+        if teacher_id is not None:
+            owners.append(('teacher', teacher_id))
+        return [((owner_type, owner_id, state), counters) for owner_type, owner_id in owners]
+
+    @classmethod
+    def record(cls, connection, transitions):
+        """Applies (before, after) assignment keys to the counters, None meaning the assignment did not
+        exist before / does not exist after. Issues one INSERT ... ON CONFLICT DO UPDATE for all the stats rows touched
+        (SQLite, PostgreSQL), else an UPDATE, and an INSERT when it matched no row, per stats row."""
+        if not cls.tracking:
+            return
+
+        deltas = defaultdict(Counter)
+        for before, after in transitions:
+            if before == after:
+                continue
+            for pk, counters in cls._contributions(before) if before is not None else ():
+                deltas[pk].subtract(counters)
+            for pk, counters in cls._contributions(after) if after is not None else ():
+                deltas[pk].update(counters)
+
+        rows = [
+            dict(owner_type=owner_type, owner_id=owner_id, state=state, **{name: counters[name] for name in COUNTERS})
+            for (owner_type, owner_id, state), counters in deltas.items() if any(counters.values())
+        ]
+        if not rows:
+            return
+        if connection.dialect.name in cls._INSERTS:
+            connection.execute(cls._upsert_statement(connection.dialect.name), rows)
+            return
+
+        # other backends: UPDATE then INSERT when no row matched, only safe while the writers are serialized
+        increment = cls._increment_statement()
+        for row in rows:
+            params = {'key_' + column: row[column] for column in ('owner_type', 'owner_id', 'state')}
+            params.update(('delta_' + name, row[name]) for name in COUNTERS)
+            if connection.execute(increment, params).rowcount == 0:
+                connection.execute(cls.__table__.insert(), row)
+
+    @classmethod
+    def retract(cls, connection, assignment_criterion):
+        """Takes the assignment matching `assignment_criterion` (one row at most) out of the counters with one
+        statement, reading its owners, state and grade in subqueries. Does nothing when no assignment matches,
+        so it can run ahead of a conditional UPDATE with the same criterion, before the old values are overwritten."""
+        if not cls.tracking:
+            return
+
+        assignments = db.metadata.tables['assignments']
+
+        def current(column):
+            return db.select([column]).where(assignment_criterion).scalar_subquery()
+
+        table = cls.__table__
+        grade = current(assignments.c.grade)
+        values = {'total': table.c.total - 1}
+        values.update(
+            ('grade_' + g.lower(), table.c['grade_' + g.lower()] - db.case([(grade == g, 1)], else_=0)) for g in GRADES
+        )
+        connection.execute(table.update().where(
+            db.or_(
+                (table.c.owner_type == 'student') & (table.c.owner_id == current(assignments.c.student_id)),
+                (table.c.owner_type == 'teacher') & (table.c.owner_id == current(assignments.c.teacher_id)),
+            )
+            # the state column is an enum type on PostgreSQL, the stats keep its name
+            & (table.c.state == db.cast(current(assignments.c.state), table.c.state.type))
+        ).values(values))
+
+    # INSERT of the deltas as a new stats row, or added to the existing one. Unlike an UPDATE followed by an INSERT
+    # when no row matched, two transactions creating the same row both succeed (PostgreSQL runs them concurrently).
+    # Built once per dialect, as large imports run it for many rows.
+    _upserts = {}
+    _INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+    @classmethod
+    def _upsert_statement(cls, dialect_name):
+        if dialect_name not in cls._upserts:
+            insert = cls._INSERTS[dialect_name](cls.__table__)
+            cls._upserts[dialect_name] = insert.on_conflict_do_update(
+                index_elements=['owner_type', 'owner_id', 'state'],
+                set_={name: cls.__table__.c[name] + insert.excluded[name] for name in COUNTERS}
+            )
+        return cls._upserts[dialect_name]
+
+    # UPDATE adding the delta_<counter> params to the key_<column> row, for the backends without an upsert above
+    _increment = None
+
+    @classmethod
+    def _increment_statement(cls):
+        if cls._increment is None:
+            table = cls.__table__
+            cls._increment = table.update().where(
+                (table.c.owner_type == db.bindparam('key_owner_type'))
+                & (table.c.owner_id == db.bindparam('key_owner_id'))
+                & (table.c.state == db.bindparam('key_state'))
+            ).values({name: table.c[name] + db.bindparam('delta_' + name) for name in COUNTERS})
+        return cls._increment
+
+    @classmethod
+    def expected_counters(cls, connection):
+        """{(owner_type, owner_id, state): {counter: value}} computed from scratch from the assignments table"""
+        assignments = db.metadata.tables['assignments']
+        columns = [func.count(assignments.c.id)] + [
+            func.sum(db.case([(assignments.c.grade == grade, 1)], else_=0)) for grade in GRADES
+        ]
+
+        expected = {}
+        for owner_type, owner_column in (('student', assignments.c.student_id), ('teacher', assignments.c.teacher_id)):
+            rows = connection.execute(
+                db.select([owner_column, assignments.c.state] + columns)
+                .where(owner_column.isnot(None))
+                .group_by(owner_column, assignments.c.state)
+            )
+            for owner_id, state, *values in rows:
+                state = getattr(state, 'value', state)
+                expected[(owner_type, owner_id, state)] = dict(zip(COUNTERS, (value or 0 for value in values)))
+        return expected
+
+    @classmethod
+    def live_counters(cls, connection):
+        table = cls.__table__
+        return {
+            (row.owner_type, row.owner_id, row.state): {name: row[name] for name in COUNTERS}
+            for row in connection.execute(table.select())
+            if any(row[name] for name in COUNTERS)
+        }
+
+    @classmethod
+    def diff(cls, connection):
+        """Rows where the live counters differ from a rebuild: [(key, expected, live)], empty when consistent"""
+        expected = cls.expected_counters(connection)
+        live = cls.live_counters(connection)
+        return [
+            (key, expected.get(key), live.get(key))
+            for key in sorted(set(expected) | set(live), key=str)
+            if expected.get(key) != live.get(key)
+        ]
+
+    @classmethod
+    def rebuild(cls, connection):
+        table = cls.__table__
+        rows = [
+            dict(owner_type=owner_type, owner_id=owner_id, state=state, **counters)
+            for (owner_type, owner_id, state), counters in cls.expected_counters(connection).items()
+        ]
+        connection.execute(table.delete())
+        if rows:
+            connection.execute(table.insert(), rows)
+
+    @classmethod
+    def graded_assignments_per_student(cls):
+        return db.session.query(cls.owner_id, cls.total).filter(
+            cls.owner_type == 'student', cls.state == 'GRADED', cls.total > 0
+        ).order_by(cls.owner_id).all()
+
+    @classmethod
+    def grade_a_count_for_top_grader(cls):
+        """(teacher_id, grade A count) of the teacher who graded the most assignments, or None"""
+        top_grader = db.session.query(cls.owner_id).filter(
+            cls.owner_type == 'teacher', cls.state == 'GRADED', cls.total > 0
+        ).order_by(cls.total.desc(), cls.owner_id.desc()).first()
+        if top_grader is None:
+            return None
+
+        grade_a_count = db.session.query(func.coalesce(func.sum(cls.grade_a), 0)).filter(
+            cls.owner_type == 'teacher', cls.owner_id == top_grader.owner_id
+        ).scalar()
+        return top_grader.owner_id, grade_a_count
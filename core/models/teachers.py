@@ -1,4 +1,5 @@
 from core import db
+from sqlalchemy import func
 from core.libs import helpers
 
 
@@ -19,3 +20,8 @@ class Teacher(db.Model):
     def get_teachers(cls):
         return cls.query.all()
 
+    # (row count, max updated_at) of the teachers table, changes whenever a teacher is added or edited
+    @classmethod
+    def get_fingerprint(cls):
+        return tuple(db.session.query(func.count(cls.id), func.max(cls.updated_at)).one())
+
@@ -0,0 +1,48 @@
+import gc
+from sqlalchemy.orm import configure_mappers
+from core import app, db
+from core.apis.decorators import principal_directory
+from core.apis.teachers.principal import teachers_snapshot
+from core.libs import log
+from core.models.assignments import Assignment
+
+# Hooks of the gunicorn production profile (gunicorn_config.py), which loads the app once in the master
+# (preload_app) and forks the workers from it, so the imported modules and warmed caches are shared copy-on-write.
+
+
+def warm_up():
+    """Does the work the first requests of a worker would otherwise pay for: registers the blueprints, configures
+    the mappers, loads the principal directory and teacher snapshot, and compiles the SQL of the list routes into the
+    engine's cache. The compiled serializers (core/libs/serializers.py) are built at import, so preloading already
+    shares them."""
+    app.load_blueprints()
+    configure_mappers()
+    with app.app_context():
+        # on the read engine, like the routes (decorators.read_only)
+        db.session.info['read_only'] = True
+        principal_directory.get()
+        teachers_snapshot.get()
+
+        # statements are cached by their shape, the ids and limits are parameters
+        for query in (Assignment.query_by_student(0), Assignment.query_by_teacher(0), Assignment.query_by_principal()):
+            Assignment.get_fingerprint(query)
+            Assignment.get_page(query, limit=1)
+
+
+# In the master, once the app is loaded and before the first fork
+def before_fork():
+    warm_up()
+    # no database connection is handed down to the workers
+    db.engine.dispose()
+    db.get_read_engine().dispose()
+    # objects allocated so far are left out of garbage collection, whose passes would otherwise write to
+    # (and so copy) the shared pages of every object they visit
+    gc.freeze()
+
+
+# In every worker, right after the fork
+def after_fork():
+    # SQLite handles must not cross fork(), the worker opens its own connections
+    db.engine.dispose()
+    db.get_read_engine().dispose()
+    log.after_fork()
@@ -2,13 +2,33 @@ import os
 
 # https://docs.gunicorn.org/en/stable/settings.html
 
+# 'development' reloads the code on changes, 'production' loads the app once in the master and forks the workers
+# from it (see core/prefork.py), sized from the CPUs unless GUNICORN_NUMBER_WORKERS / _WORKER_THREADS are set
+profile = os.environ.get('GUNICORN_PROFILE', 'development')
+assert profile in ('development', 'production'), 'unknown gunicorn profile {0!r}'.format(profile)
+
+
+# CPUs this process may run on, which can be fewer than the machine's in a container
+def cpu_count():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# production: a worker per CPU and one spare, as a request keeps its worker's CPU busy in Python and SQLite,
+# and two threads per worker to serve another request while one waits on the client or a database lock
+if profile == 'production':
+    default_workers, default_threads = cpu_count() + 1, 2
+else:
+    default_workers, default_threads = 1, 1
+
 proc_name = 'fyle-interview-be'
 port_number = int(os.environ.get('GUNICORN_PORT', 7755))
 bind = '0.0.0.0:{0}'.format(port_number)
 
 backlog      = int(os.environ.get('GUNICORN_BACKLOG', 50))
-workers      = int(os.environ.get('GUNICORN_NUMBER_WORKERS', 1))
-threads      = int(os.environ.get('GUNICORN_NUMBER_WORKER_THREADS', 1))
+workers      = int(os.environ.get('GUNICORN_NUMBER_WORKERS', default_workers))
+threads      = int(os.environ.get('GUNICORN_NUMBER_WORKER_THREADS', default_threads))
 worker_connections = int(os.environ.get('GUNICORN_NUMBER_WORKER_CONNECTIONS', 20))
 timeout      = int(os.environ.get('GUNICORN_WORKER_TIMEOUT', 60))
 keepalive    = int(os.environ.get('GUNICORN_KEEPALIVE', 2))
@@ -19,7 +39,8 @@ max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
 max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 20))
 graceful_timeout = int(os.environ.get('GUNICORN_WORKER_GRACEFUL_TIMEOUT', 5))
 
-reload = True
+preload_app = profile == 'production'
+reload = not preload_app
 
 limit_request_line = 0
 
@@ -41,6 +62,14 @@ access_log_format = '%({X-Real-IP}i)s - - - %(t)s.%(T)s "%(r)s" "%(f)s" "%(a)s"
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
+    if preload_app:
+        from core import prefork
+        prefork.after_fork()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker ready (pid: %s)", worker.pid)
+
 
 def pre_fork(server, worker):
     pass
@@ -51,6 +80,10 @@ def pre_exec(server):
 
 
 def when_ready(server):
+    if preload_app:
+        from core import prefork
+        prefork.before_fork()
+
     server.log.info("Server is ready. Spawning workers")
 
 
@@ -82,6 +115,11 @@ def child_exit(server, worker):
     server.log.info("server: child_exit is called")
     worker.log.info("worker: child_exit is called")
 
+    # drops the live samples of the dead worker from /metrics, see PROMETHEUS_MULTIPROC_DIR in the README
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
 
 def worker_exit(server, worker):
     server.log.info("server: worker_exit is called")
@@ -7,7 +7,7 @@ WITH TeacherAssignmentCounts AS (
 MaxGradingTeacher AS (
     SELECT teacher_id
     FROM TeacherAssignmentCounts
-    ORDER BY total_graded DESC
+    ORDER BY total_graded DESC, teacher_id DESC
     LIMIT 1
 )
 SELECT COUNT(*) AS grade_A_count FROM assignments
@@ -1,8 +1,14 @@
+import pytest
 import random
-from sqlalchemy import text
+from sqlalchemy import func, text
 
 from core import db
 from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum, AssignmentStateEnum
+from core.models.grade_stats import GradeStat
+from core.models.students import Student
+from core.models.teachers import Teacher
+from core.models.users import User
+from tests import app
 
 
 def create_n_graded_assignments_for_teacher(number: int = 0, teacher_id: int = 1) -> int:
@@ -113,3 +119,94 @@ def test_get_grade_A_assignments_for_teacher_with_max_grading():
     sql_result = db.session.execute(text(sql)).fetchall()
     print("sql_Result", sql_result)
     assert grade_a_count_2 == sql_result[0][0]
+
+
+def test_grade_stats_consistent():
+    """The incrementally maintained grade_stats match a rebuild from the assignments table"""
+    assert GradeStat.diff(db.session.connection()) == []
+
+
+
+def test_grade_stats_record_without_upsert(monkeypatch):
+    """On backends without INSERT ... ON CONFLICT, record updates the existing stats rows and inserts the new ones"""
+    monkeypatch.setattr(GradeStat, '_INSERTS', {})
+    connection = db.session.connection()
+    before = GradeStat.live_counters(connection)
+    new_student_id = db.session.query(func.max(Student.id)).scalar() + 1
+
+    try:
+        GradeStat.record(connection, [
+            (None, (1, 1, 'GRADED', 'A')),
+            (None, (new_student_id, None, 'DRAFT', None)),
+        ])
+        after = GradeStat.live_counters(connection)
+
+        assert after[('student', 1, 'GRADED')]['grade_a'] == before[('student', 1, 'GRADED')]['grade_a'] + 1
+        assert after[('teacher', 1, 'GRADED')]['total'] == before[('teacher', 1, 'GRADED')]['total'] + 1
+        assert after[('student', new_student_id, 'DRAFT')] == dict(total=1, grade_a=0, grade_b=0, grade_c=0, grade_d=0)
+    finally:
+        db.session.rollback()
+
+@pytest.mark.max_queries(2)
+def test_grade_stats_reports_match_sql(client, h_principal):
+    """The principal report endpoints answer the same as the SQL reports"""
+    with open('tests/SQL/number_of_graded_assignments_for_each_student.sql', encoding='utf8') as fo:
+        sql_result = db.session.execute(text(fo.read())).fetchall()
+
+    response = client.get('/principal/reports/graded-assignments', headers=h_principal)
+    assert response.status_code == 200
+    assert sorted(
+        (row['student_id'], row['graded_assignments_count']) for row in response.json['data']
+    ) == sorted(tuple(row) for row in sql_result)
+
+    with open('tests/SQL/count_grade_A_assignments_by_teacher_with_max_grading.sql', encoding='utf8') as fo:
+        sql_result = db.session.execute(text(fo.read())).fetchall()
+
+    response = client.get('/principal/reports/top-grader-grade-a', headers=h_principal)
+    assert response.status_code == 200
+    assert response.json['data']['grade_a_count'] == sql_result[0][0]
+
+
+def test_grade_stats_check_command():
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['grade-stats', 'check'])
+    assert result.exit_code == 0
+    assert 'consistent' in result.output
+
+
+def test_seed_command():
+    """flask seed adds the requested rows, with a teacher on every non-draft and a grade on every graded assignment"""
+    runner = app.test_cli_runner()
+    counts = {model: model.query.count() for model in (User, Student, Teacher, Assignment)}
+    # the seeded rows come after these ids, they are deleted at the end so reruns start from the same data
+    max_ids = {model: db.session.query(func.coalesce(func.max(model.id), 0)).scalar() for model in counts}
+
+    try:
+        result = runner.invoke(args=['seed', '--students', '5', '--teachers', '2', '--assignments', '50', '--batch-size', '20'])
+        assert result.exit_code == 0
+
+        assert User.query.count() == counts[User] + 7
+        assert Student.query.count() == counts[Student] + 5
+        assert Teacher.query.count() == counts[Teacher] + 2
+        assert Assignment.query.count() == counts[Assignment] + 50
+
+        seeded = Assignment.query.filter(Assignment.content.like('Seeded assignment %')).all()
+        assert all((a.teacher_id is None) == (a.state == AssignmentStateEnum.DRAFT) for a in seeded)
+        assert all((a.grade is not None) == (a.state == AssignmentStateEnum.GRADED) for a in seeded)
+        assert GradeStat.diff(db.session.connection()) == []
+
+        # the ids given by the database come after the seeded ones
+        user = User(username='after_seed', email='after_seed@fylebe.com')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([Student(user_id=user.id), Teacher(user_id=user.id)])
+        db.session.flush()
+    finally:
+        db.session.rollback()
+        for model in (Assignment, Student, Teacher, User):
+            model.query.filter(model.id > max_ids[model]).delete(synchronize_session=False)
+        GradeStat.rebuild(db.session.connection())
+        db.session.commit()
+
+    assert {model: model.query.count() for model in counts} == counts
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import httpx
+import pytest
+from starlette.testclient import TestClient
+from core.asgi import app as asgi_app
+from core.asgi.database import engine
+from core.apis.decorators import principal_directory
+
+ACCEPT_JSON = {'Accept': 'application/json'}
+
+
+@pytest.fixture
+def asgi_client():
+    # the lifespan closes the pooled connections, which are bound to the client's event loop
+    with TestClient(asgi_app) as client:
+        yield client
+
+
+@pytest.mark.parametrize('path, principal', [
+    ('/student/assignments', 'h_student_1'),
+    ('/teacher/assignments', 'h_teacher_1'),
+    ('/principal/assignments', 'h_principal'),
+    ('/principal/teachers', 'h_principal'),
+    ('/student/assignments?limit=1', 'h_student_1'),
+    ('/student/assignments?stream=1', 'h_student_1'),
+])
+def test_lists_match_flask(client, asgi_client, request, path, principal):
+    headers = {**request.getfixturevalue(principal), **ACCEPT_JSON}
+
+    expected = client.get(path, headers=headers)
+    response = asgi_client.get(path, headers=headers)
+
+    assert response.status_code == expected.status_code == 200
+    assert response.json() == expected.json
+    assert response.headers.get('ETag') == expected.headers.get('ETag')
+
+    if 'ETag' in expected.headers:
+        response = asgi_client.get(path, headers={**headers, 'If-None-Match': expected.headers['ETag']})
+        assert response.status_code == 304
+
+
+@pytest.mark.parametrize('path, principal, payload', [
+    ('/student/assignments/submit', 'h_student_2', {'id': 2, 'teacher_id': 2}),
+    ('/student/assignments/submit', 'h_student_1', {'id': 1}),
+    ('/student/assignments', 'h_student_1', {'content': None}),
+    ('/teacher/assignments/grade', 'h_teacher_2', {'id': 1, 'grade': 'A'}),
+    ('/teacher/assignments/grade', 'h_teacher_1', {'id': 100000, 'grade': 'A'}),
+    ('/principal/assignments/grade', 'h_principal', {'id': 5, 'grade': 'A'}),
+    ('/principal/assignments/grade', 'h_student_1', {'id': 5, 'grade': 'A'}),
+])
+def test_errors_match_flask(client, asgi_client, request, path, principal, payload):
+    headers = request.getfixturevalue(principal)
+
+    expected = client.post(path, headers=headers, json=payload)
+    response = asgi_client.post(path, headers=headers, json=payload)
+
+    assert response.status_code == expected.status_code
+    assert response.status_code >= 400
+    assert response.json() == expected.json
+
+
+def test_upsert_and_submit(asgi_client, h_student_2):
+    response = asgi_client.post('/student/assignments', headers=h_student_2, json={'content': 'ASYNC T2'})
+
+    assert response.status_code == 200
+    draft = response.json()['data']
+    assert draft['state'] == 'DRAFT'
+    assert response.headers['ETag'] == '"1"'
+
+    response = asgi_client.post(
+        '/student/assignments',
+        headers={**h_student_2, 'If-Match': '"1"'},
+        json={'id': draft['id'], 'content': 'ASYNC T2 edited'}
+    )
+    assert response.status_code == 200
+    assert response.json()['data']['version'] == 2
+
+    response = asgi_client.post(
+        '/student/assignments', headers=h_student_2, json={'id': draft['id'], 'content': 'stale', 'version': 1}
+    )
+    assert response.status_code == 409
+
+    response = asgi_client.post(
+        '/student/assignments/submit', headers=h_student_2, json={'id': draft['id'], 'teacher_id': 2}
+    )
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert data['state'] == 'SUBMITTED'
+    assert data['teacher_id'] == 2
+    assert data['content'] == 'ASYNC T2 edited'
+
+
+def test_submit_keeps_the_directory_off_the_event_loop(asgi_client, h_student_2, monkeypatch):
+    get = principal_directory.get
+
+    # a reload on the event loop would block every request in flight on the sync session
+    def get_off_the_loop():
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return get()
+        raise AssertionError('principal directory read on the event loop')
+
+    monkeypatch.setattr(principal_directory, 'get', get_off_the_loop)
+    principal_directory.invalidate()
+
+    draft = asgi_client.post('/student/assignments', headers=h_student_2, json={'content': 'ASYNC T2 directory'}).json()
+    response = asgi_client.post(
+        '/student/assignments/submit', headers=h_student_2, json={'id': draft['data']['id'], 'teacher_id': 100000}
+    )
+
+    assert response.status_code == 400
+    assert response.json()['message'] == 'No teacher with this id was found'
+
+
+def test_other_routes_served_by_flask(asgi_client, h_teacher_2):
+    response = asgi_client.post('/teacher/assignments/grade/bulk', headers=h_teacher_2, json=[{'id': 100000, 'grade': 'A'}])
+
+    assert response.status_code == 200
+    assert response.json()['data'] == [{
+        'id': 100000, 'status_code': 404, 'error': 'FyleError', 'message': 'No assignment with this id was found'
+    }]
+    assert 'X-Request-Id' in response.headers
+
+
+def test_requests_in_flight_together(h_student_1, h_teacher_1):
+    async def serve():
+        # the transport does not run the lifespan, which connects the engine on startup
+        async with engine.connect():
+            pass
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            responses = await asyncio.gather(*[
+                client.get(path, headers=headers)
+                for path, headers in [('/student/assignments', h_student_1), ('/teacher/assignments', h_teacher_1)] * 20
+            ])
+        await engine.dispose()
+        return responses
+
+    responses = asyncio.run(serve())
+
+    assert [response.status_code for response in responses] == [200] * 40
+    assert len({json.dumps(response.json()) for response in responses}) == 2
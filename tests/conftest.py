@@ -1,11 +1,58 @@
 import pytest
 import json
+from flask.testing import FlaskClient
+from sqlalchemy import event
 from tests import app
+from core import db
+from core.apis.decorators import principal_directory
+from core.apis.teachers.principal import teachers_snapshot
+
+
+class QueryBudgetClient(FlaskClient):
+    """Fails the test when a single call issues more SQL statements than its max_queries budget.
+    The in-process caches are loaded before each call, so the budget counts what the endpoint itself runs."""
+
+    max_queries = None
+
+    def open(self, *args, **kwargs):
+        if self.max_queries is None:
+            return super().open(*args, **kwargs)
+
+        with app.app_context():
+            principal_directory.get()
+            teachers_snapshot.get()
+            engines = {db.engine, db.get_read_engine()}
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', count_statement)
+        try:
+            response = super().open(*args, **kwargs)
+            # a streamed body runs its queries while it is read
+            response.get_data()
+        finally:
+            for engine in engines:
+                event.remove(engine, 'before_cursor_execute', count_statement)
+
+        if len(statements) > self.max_queries:
+            pytest.fail('{0} {1} issued {2} SQL statements, the budget is {3}:\n{4}'.format(
+                response.request.method, response.request.path, len(statements), self.max_queries,
+                '\n'.join(statements)
+            ))
+        return response
 
 
 @pytest.fixture
-def client():
-    return app.test_client()
+def client(request):
+    client = QueryBudgetClient(app, app.response_class, use_cookies=True)
+    marker = request.node.get_closest_marker('max_queries')
+    if marker is not None:
+        client.max_queries = marker.args[0]
+    return client
 
 
 @pytest.fixture
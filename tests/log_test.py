@@ -0,0 +1,76 @@
+import json
+import logging
+import queue
+from core.libs import log
+
+
+def capture_records():
+    records = queue.Queue()
+    handler = log.make_queue_handler(records)
+    logging.getLogger('core').addHandler(handler)
+    return records, handler
+
+
+def drain(records):
+    result = []
+    while not records.empty():
+        result.append(records.get_nowait())
+    return result
+
+
+def test_request_id_is_returned(client, h_principal):
+    response = client.get('/principal/teachers', headers={**h_principal, 'X-Request-Id': 'req-1'})
+    assert response.headers['X-Request-Id'] == 'req-1'
+
+    response = client.get('/principal/teachers', headers=h_principal)
+    assert len(response.headers['X-Request-Id']) == 32
+
+
+def test_log_records_carry_request_id(client, h_principal):
+    records, handler = capture_records()
+    try:
+        client.get('/principal/assignments', headers={**h_principal, 'X-Request-Id': 'req-2'})
+    finally:
+        logging.getLogger('core').removeHandler(handler)
+
+    access_lines = [json.loads(log.JsonFormatter().format(record)) for record in drain(records)]
+    assert access_lines[-1]['message'] == 'request'
+    assert access_lines[-1]['request_id'] == 'req-2'
+    assert access_lines[-1]['path'] == '/principal/assignments'
+    assert access_lines[-1]['status'] == 200
+
+
+def test_sampling_and_level_gating():
+    logger = logging.getLogger('core.tests')
+    records, handler = capture_records()
+    try:
+        logger.debug('below the configured level')
+        logger.info('never sampled', extra={'sample_rate': 0})
+        logger.info('always sampled', extra={'sample_rate': 1})
+    finally:
+        logging.getLogger('core').removeHandler(handler)
+
+    assert [record.getMessage() for record in drain(records)] == ['always sampled']
+
+
+def test_full_queue_drops_records():
+    handler = log.make_queue_handler(queue.Queue(maxsize=1))
+    record = logging.LogRecord('core', logging.INFO, __file__, 1, 'message', (), None)
+    handler.handle(record)
+    handler.handle(record)
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_after_fork_starts_a_new_writer():
+    listener = log._listener
+    log.after_fork()
+
+    assert log._listener is not listener
+    assert log._listener._thread.is_alive()
+    assert log._listener.queue is log._queue_handler.queue is not listener.queue
+    assert log._listener.handlers == listener.handlers
+
+    # a forked child has no thread of the old writer, this process does
+    listener.stop()
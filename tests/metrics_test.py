@@ -0,0 +1,48 @@
+from prometheus_client.parser import text_string_to_metric_families
+
+
+def get_samples(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+    samples = {}
+    for family in text_string_to_metric_families(response.get_data(as_text=True)):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return samples
+
+
+def test_metrics_count_requests_and_sql(client, h_principal):
+    endpoint = 'principal_teachers_resources.list_teachers_for_principal'
+    before = get_samples(client)
+    client.get('/principal/teachers', headers=h_principal)
+    after = get_samples(client)
+
+    key = ('http_request_duration_seconds_count', (('endpoint', endpoint), ('method', 'GET')))
+    assert after[key] == before.get(key, 0) + 1
+
+    key = ('http_requests_total', (('endpoint', endpoint), ('method', 'GET'), ('status', '200')))
+    assert after[key] == before.get(key, 0) + 1
+
+    key = ('http_response_size_bytes_count', (('endpoint', endpoint),))
+    assert after[key] == before.get(key, 0) + 1
+
+    key = ('db_statements_per_request_count', (('endpoint', endpoint),))
+    assert after[key] == before.get(key, 0) + 1
+
+
+def test_metrics_count_errors(client, h_principal):
+    key = ('http_errors_total', (('error', 'FyleError'), ('status', '404')))
+    before = get_samples(client)
+    client.post(
+        '/principal/assignments/grade',
+        json={'id': 9999, 'grade': 'A'},
+        headers=h_principal
+    )
+    after = get_samples(client)
+
+    assert after[key] == before.get(key, 0) + 1
+
+    key = ('db_statements_total', (('endpoint', 'principal_assignments_resources.grade_assignment_for_principal'),))
+    assert after[key] > before.get(key, 0)
@@ -0,0 +1,16 @@
+import gc
+from core import prefork
+from core.apis.decorators import principal_directory
+from core.apis.teachers.principal import teachers_snapshot
+
+
+def test_before_fork_loads_the_caches():
+    principal_directory.invalidate()
+    teachers_snapshot.invalidate()
+    try:
+        prefork.before_fork()
+    finally:
+        gc.unfreeze()
+
+    assert principal_directory.is_fresh()
+    assert teachers_snapshot.is_fresh()
@@ -1,6 +1,45 @@
+import pytest
+import csv
+import io
+import json
+import uuid
 from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
 from core.models.principals import Principal
-
+from core.models.teachers import Teacher
+from core.models.users import User
+from core.apis.decorators import principal_directory
+from core.apis.teachers.principal import teachers_snapshot
+from core import db
+from core.config import Config
+from core.models.grade_stats import GradeStat
+from tests import app
+
+
+@pytest.fixture
+def new_teacher():
+    """Commits a user and a teacher with a username unique to this run, and deletes them after the test"""
+    created = []
+
+    def create(name):
+        username = '{0}_{1}'.format(name, uuid.uuid4().hex)
+        user = User(username=username, email='{0}@fylebe.com'.format(username))
+        db.session.add(user)
+        db.session.flush()
+        teacher = Teacher(user_id=user.id)
+        db.session.add(teacher)
+        db.session.commit()
+        created.append((user.id, teacher.id))
+        return user, teacher
+
+    yield create
+
+    db.session.rollback()
+    for user_id, teacher_id in created:
+        Teacher.query.filter_by(id=teacher_id).delete()
+        User.query.filter_by(id=user_id).delete()
+    db.session.commit()
+
+@pytest.mark.max_queries(2)
 def test_get_assignments(client, h_principal):
     response = client.get(
         '/principal/assignments',
@@ -14,6 +53,85 @@ def test_get_assignments(client, h_principal):
         assert assignment['state'] in [AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED]
 
 
+@pytest.mark.max_queries(2)
+def test_get_assignments_paginated(client, h_principal):
+    """Walking the pages with next_cursor returns every assignment exactly once"""
+    response = client.get(
+        '/principal/assignments',
+        headers=h_principal
+    )
+    all_ids = [assignment['id'] for assignment in response.json['data']]
+    assert 'next_cursor' not in response.json
+
+    paged_ids = []
+    cursor = None
+    while True:
+        query_string = {'limit': 1}
+        if cursor:
+            query_string['cursor'] = cursor
+
+        response = client.get(
+            '/principal/assignments',
+            headers=h_principal,
+            query_string=query_string
+        )
+        assert response.status_code == 200
+        assert len(response.json['data']) <= 1
+
+        paged_ids.extend(assignment['id'] for assignment in response.json['data'])
+        cursor = response.json.get('next_cursor')
+        if cursor is None:
+            break
+
+    assert paged_ids == all_ids
+
+
+@pytest.mark.max_queries(2)
+def test_get_assignments_streamed(client, h_principal):
+    """?stream=1 and NDJSON return the same assignments as the paged response"""
+    response = client.get(
+        '/principal/assignments',
+        headers=h_principal
+    )
+    expected = response.json['data']
+
+    response = client.get(
+        '/principal/assignments',
+        headers=h_principal,
+        query_string={'stream': 1}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.json == {'data': expected}
+
+    response = client.get(
+        '/principal/assignments',
+        headers={**h_principal, 'Accept': 'application/x-ndjson'}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+
+@pytest.mark.max_queries(1)
+def test_get_assignments_invalid_page_args(client, h_principal):
+    response = client.get(
+        '/principal/assignments',
+        headers=h_principal,
+        query_string={'cursor': 'not-a-cursor'}
+    )
+    assert response.status_code == 400
+
+    response = client.get(
+        '/principal/assignments',
+        headers=h_principal,
+        query_string={'limit': 0}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.max_queries(3)
 def test_grade_assignment_draft_assignment(client, h_principal):
     """
     failure case: If an assignment is in Draft state, it cannot be graded by principal
@@ -30,6 +148,7 @@ def test_grade_assignment_draft_assignment(client, h_principal):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(7)
 def test_grade_assignment(client, h_principal):
     response = client.post(
         '/principal/assignments/grade',
@@ -46,6 +165,7 @@ def test_grade_assignment(client, h_principal):
     assert response.json['data']['grade'] == GradeEnum.C
 
 
+@pytest.mark.max_queries(5)
 def test_regrade_assignment(client, h_principal):
     response = client.post(
         '/principal/assignments/grade',
@@ -63,8 +183,187 @@ def test_regrade_assignment(client, h_principal):
 
 
 
+@pytest.mark.max_queries(3)
+def test_grade_assignments_bulk(client, h_principal):
+    response = client.post(
+        '/principal/assignments/grade/bulk',
+        json=[
+            {'id': 4, 'grade': GradeEnum.B.value},
+            {'id': 5, 'grade': GradeEnum.A.value},
+        ],
+        headers=h_principal
+    )
+
+    assert response.status_code == 200
+    results = response.json['data']
+
+    assert results[0]['status_code'] == 200
+    assert results[0]['data']['grade'] == GradeEnum.B
+    assert results[1]['status_code'] == 400
+    assert results[1]['message'] == 'Assignments in draft state cannot be graded'
+
+
+
+@pytest.mark.max_queries(6)
+def test_get_assignments_not_modified(client, h_principal):
+    """A matching If-None-Match returns 304 until an assignment of the scope changes"""
+    response = client.get('/principal/assignments', headers=h_principal)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get('/principal/assignments', headers={**h_principal, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.get_data() == b''
+
+    response = client.get('/principal/assignments', headers={**h_principal, 'If-None-Match': etag}, query_string={'limit': 1})
+    assert response.status_code == 200
+
+    client.post(
+        '/principal/assignments/grade',
+        json={'id': 4, 'grade': GradeEnum.A.value},
+        headers=h_principal
+    )
+    response = client.get('/principal/assignments', headers={**h_principal, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.max_queries(0)
+def test_list_teachers_not_modified(client, h_principal):
+    response = client.get('/principal/teachers', headers=h_principal)
+    etag = response.headers['ETag']
+
+    response = client.get('/principal/teachers', headers={**h_principal, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.max_queries(0)
+def test_list_teachers_snapshot(client, h_principal, new_teacher):
+    """Repeated reads are served from the snapshot until a teacher insert is committed"""
+    response = client.get('/principal/teachers', headers=h_principal)
+    teachers = response.json['data']
+
+    hits, misses = teachers_snapshot.hits, teachers_snapshot.misses
+    response = client.get('/principal/teachers', headers=h_principal)
+    assert response.json['data'] == teachers
+    assert teachers_snapshot.misses == misses
+    assert teachers_snapshot.hits > hits
+
+    user, teacher = new_teacher('teacher_snapshot')
+
+    response = client.get('/principal/teachers', headers=h_principal)
+    assert teachers_snapshot.misses == misses + 1
+    assert [t['id'] for t in response.json['data']] == [t['id'] for t in teachers] + [teacher.id]
+
+
+
+@pytest.mark.max_queries(12)
+def test_import_assignments_ndjson(client, h_principal, monkeypatch):
+    """Valid rows are inserted chunk by chunk, invalid ones are reported with their record number"""
+    monkeypatch.setattr(Config, 'IMPORT_CHUNK_SIZE', 2)
+    count = Assignment.query.count()
+    body = '\n'.join([
+        json.dumps({'student_id': 1, 'content': 'imported draft'}),
+        json.dumps({'student_id': 2, 'teacher_id': 2, 'content': 'imported submission', 'state': 'SUBMITTED'}),
+        json.dumps({'student_id': 9999, 'content': 'unknown student'}),
+        '{not json',
+        json.dumps({'student_id': 1, 'teacher_id': 1, 'content': 'no grade', 'state': 'GRADED'}),
+    ])
+
+    response = client.post(
+        '/principal/assignments/import',
+        data=body,
+        headers={**h_principal, 'Content-Type': 'application/x-ndjson'}
+    )
+
+    assert response.status_code == 200
+    assert response.json['data']['imported'] == 2
+    assert response.json['data']['rejected'] == 3
+    errors = {reject['record']: reject['errors'] for reject in response.json['data']['rejects']}
+    assert sorted(errors) == [3, 4, 5]
+    assert errors[3] == {'student_id': ['No student with this id was found']}
+    assert 'grade' in errors[5]
+    assert Assignment.query.count() == count + 2
+    assert GradeStat.diff(db.session.connection()) == []
+
+
+@pytest.mark.max_queries(6)
+def test_import_assignments_csv(client, h_principal):
+    body = 'student_id,teacher_id,content,state\r\n2,1,"imported, from csv",SUBMITTED\r\n1,,imported draft,\r\n'
+
+    response = client.post(
+        '/principal/assignments/import',
+        data=body,
+        headers={**h_principal, 'Content-Type': 'text/csv'}
+    )
+
+    assert response.status_code == 200
+    assert response.json['data'] == {'imported': 2, 'rejected': 0, 'rejects': []}
+
+    imported = Assignment.query.filter(Assignment.content == 'imported, from csv').one()
+    assert imported.teacher_id == 1
+    assert imported.state == AssignmentStateEnum.SUBMITTED
+
+
+@pytest.mark.max_queries(0)
+def test_import_assignments_bad_content_type(client, h_principal):
+    response = client.post('/principal/assignments/import', json=[], headers=h_principal)
+
+    assert response.status_code == 400
+
+
+def test_import_assignments_command(tmp_path):
+    source = tmp_path / 'assignments.ndjson'
+    source.write_text('\n'.join([
+        json.dumps({'student_id': 2, 'content': 'imported by the command'}),
+        json.dumps({'student_id': 2, 'teacher_id': 1, 'state': 'SUBMITTED'}),
+    ]))
+    rejects = tmp_path / 'rejects.ndjson'
+
+    result = app.test_cli_runner().invoke(args=['assignments', 'import', str(source), '--rejects', str(rejects)])
+
+    assert result.exit_code == 1
+    assert '1 assignments imported, 1 rejected' in result.output
+    reject = json.loads(rejects.read_text())
+    assert reject['record'] == 2
+    assert reject['errors'] == {'content': ['assignment with empty content cannot be submitted']}
+
+
+@pytest.mark.max_queries(3)
+def test_export_assignments_csv(client, h_principal):
+    """The export has the rows of GET /principal/assignments, narrowed by the filters"""
+    expected = client.get('/principal/assignments', headers=h_principal, query_string={'limit': 1000}).json['data']
+
+    response = client.get('/principal/assignments/export.csv', headers=h_principal)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert sorted(int(row['id']) for row in rows) == sorted(assignment['id'] for assignment in expected)
+
+    response = client.get(
+        '/principal/assignments/export.csv',
+        headers=h_principal,
+        query_string={'state': 'GRADED', 'teacher_id': 1}
+    )
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert sorted(int(row['id']) for row in rows) == sorted(
+        assignment['id'] for assignment in expected
+        if assignment['state'] == 'GRADED' and assignment['teacher_id'] == 1
+    )
+    assert all(row['grade'] in 'ABCD' and row['grade'] for row in rows)
+
+
+@pytest.mark.max_queries(0)
+def test_export_assignments_invalid_filter(client, h_principal):
+    response = client.get('/principal/assignments/export.csv', headers=h_principal, query_string={'grade': 'Z'})
+
+    assert response.status_code == 400
+
+
 #  additional tests 
 
+@pytest.mark.max_queries(0)
 def test_get_assignments_unauthorized_access(client):
     """Test for unauthorized access when no principal header"""
     response = client.get('/principal/assignments')
@@ -72,6 +371,7 @@ def test_get_assignments_unauthorized_access(client):
     assert response.status_code == 401
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_invalid_grade_value(client, h_principal):
     """Test for grading an assignment with an invalid grade value."""
     response = client.post(
@@ -85,6 +385,7 @@ def test_grade_assignment_invalid_grade_value(client, h_principal):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_invalid_id_value(client, h_principal):
     """Test for grading an assignment with an invalid id value."""
     response = client.post(
@@ -98,6 +399,7 @@ def test_grade_assignment_invalid_id_value(client, h_principal):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_invalid_id_2(client, h_principal):
     """Test to ensure grading an assignment with an invalid ID fails."""
     response = client.post(
@@ -112,6 +414,7 @@ def test_grade_assignment_invalid_id_2(client, h_principal):
     assert response.status_code == 404
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_invalid_payload(client, h_principal):
     """Test for invalid payloads"""
     response = client.post(
@@ -122,6 +425,7 @@ def test_grade_assignment_invalid_payload(client, h_principal):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(5)
 def test_grade_assignment_multiple_times(client, h_principal):
     """Test for grading the same assignment multiple times"""
     # First grade
@@ -148,6 +452,7 @@ def test_grade_assignment_multiple_times(client, h_principal):
     assert response.json['data']['grade'] == GradeEnum.A.value
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_missing_grade(client, h_principal):
     """Test for missing fields in the grading payload."""
     # Missing 'grade' field
@@ -161,6 +466,7 @@ def test_grade_assignment_missing_grade(client, h_principal):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_missing_id(client, h_principal):
     # Missing 'id' field
     response = client.post(
@@ -173,6 +479,7 @@ def test_grade_assignment_missing_id(client, h_principal):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_unauthorized_method(client, h_principal):
     """
     Test unauthorized method(post) to the assignments endpoint.
@@ -185,6 +492,7 @@ def test_grade_unauthorized_method(client, h_principal):
     assert response.status_code == 405  
 
 
+@pytest.mark.max_queries(0)
 def test_grade_unauthorized_method2(client, h_principal):
     """
     Test unauthorized method(get) to the grade endpoint.
@@ -197,6 +505,7 @@ def test_grade_unauthorized_method2(client, h_principal):
     assert response.status_code == 405  
 
 
+@pytest.mark.max_queries(0)
 def test_assignments_malformed_header(client, h_teacher_1):
     """
     Test grade with Teacher id.
@@ -211,6 +520,7 @@ def test_assignments_malformed_header(client, h_teacher_1):
 
 
 # principal/teacher route 
+@pytest.mark.max_queries(0)
 def test_list_teachers_no_teachers(client, h_principal):
     """
     Test when there are no teachers available.
@@ -224,6 +534,7 @@ def test_list_teachers_no_teachers(client, h_principal):
     data = response.json['data']
 
 
+@pytest.mark.max_queries(0)
 def test_list_teachers_success(client, h_principal):
     """
     Test successful fetching of teachers.
@@ -241,6 +552,7 @@ def test_list_teachers_success(client, h_principal):
         assert 'id' in teacher  
 
 
+@pytest.mark.max_queries(0)
 def test_list_teachers_unauthorized(client):
     """
     Test unauthorized access to the teachers endpoint.
@@ -251,6 +563,7 @@ def test_list_teachers_unauthorized(client):
     assert 'error' in response.json  
 
 
+@pytest.mark.max_queries(0)
 def test_teachers_unauthorized_method(client, h_principal):
     """
     Test unauthorized method(post) to the teachers endpoint.
@@ -263,6 +576,7 @@ def test_teachers_unauthorized_method(client, h_principal):
     assert response.status_code == 405  
 
 
+@pytest.mark.max_queries(0)
 def test_list_teachers_malformed_header(client, h_student_1):
     """
     Test fetching teachers with a Student id.
@@ -276,6 +590,7 @@ def test_list_teachers_malformed_header(client, h_student_1):
     assert response.status_code == 403  
 
 
+@pytest.mark.max_queries(0)
 def test_unknown_route(client, h_teacher_1):
     """
     Test fetching teachers with a Teacher id.
@@ -293,4 +608,48 @@ def test_unknown_route(client, h_teacher_1):
 def test_principal_repr():
     principal = Principal(id=1)
     repr_student = repr(principal)
-    assert repr_student == '<Principal 1>'
\ No newline at end of file
+    assert repr_student == '<Principal 1>'
+
+# X-Principal authentication
+
+@pytest.mark.max_queries(0)
+def test_principal_header_invalid_json(client):
+    response = client.get(
+        '/principal/teachers',
+        headers={'X-Principal': '{not json'}
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.max_queries(0)
+def test_principal_header_unknown_principal(client):
+    response = client.get(
+        '/principal/teachers',
+        headers={'X-Principal': json.dumps({'principal_id': 1000, 'user_id': 5})}
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.max_queries(0)
+def test_principal_header_wrong_user(client):
+    response = client.get(
+        '/student/assignments',
+        headers={'X-Principal': json.dumps({'student_id': 1, 'user_id': 2})}
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.max_queries(2)
+def test_principal_directory_reloads_after_commit(client, new_teacher):
+    """A teacher created after the directory was loaded can authenticate once the insert is committed"""
+    principal_directory.get()
+
+    user, teacher = new_teacher('teacher_directory')
+
+    headers = {'X-Principal': json.dumps({'teacher_id': teacher.id, 'user_id': user.id})}
+
+    response = client.get('/teacher/assignments', headers=headers)
+    assert response.status_code == 200
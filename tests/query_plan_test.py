@@ -0,0 +1,98 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from core import db
+from core.libs import pagination
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+from core.models.users import User
+
+# "SCAN assignments" / "SCAN TABLE assignments AS a" without an index means a full table scan
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)(?: AS (?P<alias>\w+))?$')
+ASSIGNMENT_TABLES = {'assignments', 'a'}
+
+# the plans are read with SQLite's EXPLAIN QUERY PLAN
+pytestmark = pytest.mark.skipif(db.engine.dialect.name != 'sqlite', reason='SQLite query plans')
+
+REPORTS = [
+    'tests/SQL/count_grade_A_assignments_by_teacher_with_max_grading.sql',
+    'tests/SQL/number_of_graded_assignments_for_each_student.sql',
+]
+
+
+def explain(sql):
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    return [row[-1] for row in rows]
+
+
+def explain_query(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    return explain(str(compiled))
+
+
+def assert_no_full_scan(plan):
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if match is not None:
+            scanned = {match.group('table'), match.group('alias')}
+            assert not scanned & ASSIGNMENT_TABLES, 'full table scan on assignments: {0}'.format(plan)
+
+
+def model_queries():
+    cursor = pagination.encode_cursor(datetime(2021, 1, 1), 1)
+    scopes = {
+        'by_student': Assignment.query_by_student(1),
+        'by_teacher': Assignment.query_by_teacher(1),
+        'by_principal': Assignment.query_by_principal(),
+    }
+
+    queries = {'get_by_id': Assignment.filter(Assignment.id == 1), 'user_by_email': User.filter(User.email == 'a@b.c')}
+    for name, query in scopes.items():
+        queries[name] = pagination.keyset_query(query, Assignment.updated_at, Assignment.id, 10)
+        queries[name + '_after_cursor'] = pagination.keyset_query(query, Assignment.updated_at, Assignment.id, 10, cursor)
+        queries[name + '_fingerprint'] = Assignment.fingerprint_query(query)
+
+    return queries
+
+
+def export_queries():
+    scope = Assignment.query_by_principal()
+    return {
+        'all': Assignment.export_query(scope),
+        'by_state': Assignment.export_query(Assignment.apply_filters(scope, state=AssignmentStateEnum.GRADED)),
+        'by_grade': Assignment.export_query(Assignment.apply_filters(scope, grade=GradeEnum.A)),
+        'by_teacher': Assignment.export_query(Assignment.apply_filters(scope, teacher_id=1)),
+        'by_all': Assignment.export_query(
+            Assignment.apply_filters(scope, state=AssignmentStateEnum.GRADED, grade=GradeEnum.A, teacher_id=1)
+        ),
+    }
+
+
+@pytest.mark.parametrize('name', sorted(model_queries()))
+def test_model_queries_use_indexes(name):
+    assert_no_full_scan(explain_query(model_queries()[name]))
+
+
+@pytest.mark.parametrize('name', sorted(export_queries()))
+def test_export_queries_stream_from_indexes(name):
+    """The export reads rows in index order, a temp B-tree would hold the whole result in memory"""
+    plan = explain_query(export_queries()[name])
+    assert_no_full_scan(plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+@pytest.mark.parametrize('path', REPORTS)
+def test_reports_use_indexes(path):
+    with open(path, encoding='utf8') as fo:
+        sql = fo.read().strip().rstrip(';')
+
+    assert_no_full_scan(explain(sql))
+
+
+def test_full_scan_is_detected():
+    assert_no_full_scan(['SEARCH assignments USING INDEX ix_assignments_state_updated_at (state=?)'])
+    with pytest.raises(AssertionError):
+        assert_no_full_scan(['SCAN assignments'])
+    with pytest.raises(AssertionError):
+        assert_no_full_scan(['SCAN TABLE assignments AS a'])
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event, exc, text
+from core import db
+from tests import app
+
+# without a replica, reads can only be routed away from the primary on SQLite
+pytestmark = pytest.mark.skipif(db.get_read_engine() is db.engine, reason='the read engine is the primary')
+
+
+@contextmanager
+def statements_by_engine():
+    counts = {'primary': 0, 'read': 0}
+
+    def counter(name):
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            counts[name] += 1
+        return count_statement
+
+    listeners = [(db.engine, counter('primary')), (db.get_read_engine(), counter('read'))]
+    for engine, listener in listeners:
+        event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        yield counts
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+
+@pytest.mark.parametrize('path, principal', [
+    ('/student/assignments', 'h_student_1'),
+    ('/teacher/assignments', 'h_teacher_1'),
+    ('/principal/assignments', 'h_principal'),
+    ('/principal/assignments?stream=1', 'h_principal'),
+])
+def test_list_routes_read_from_the_read_engine(client, request, path, principal):
+    with statements_by_engine() as counts:
+        response = client.get(path, headers=request.getfixturevalue(principal))
+        response.get_data()
+
+    assert response.status_code == 200
+    assert counts['primary'] == 0
+    assert counts['read'] > 0
+
+
+def test_writes_stay_on_the_primary(client, h_student_2):
+    with statements_by_engine() as counts:
+        response = client.post('/student/assignments', headers=h_student_2, json={'content': 'ROUTED T2'})
+
+    assert response.status_code == 200
+    assert counts['primary'] > 0
+    assert counts['read'] == 0
+    assert 'Set-Cookie' not in response.headers
+
+
+def test_read_engine_rejects_writes():
+    with db.get_read_engine().connect() as connection:
+        with pytest.raises(exc.DBAPIError):
+            connection.execute(text("UPDATE assignments SET content = content WHERE id = 1"))
+
+
+def test_read_your_writes(client, h_student_2):
+    app.config['READ_YOUR_WRITES_SECONDS'] = 5
+    try:
+        response = client.post('/student/assignments', headers=h_student_2, json={'content': 'ROUTED T2 again'})
+        assert 'read_primary=1' in response.headers['Set-Cookie']
+
+        with statements_by_engine() as counts:
+            response = client.get('/student/assignments', headers=h_student_2)
+    finally:
+        app.config['READ_YOUR_WRITES_SECONDS'] = 0
+
+    assert response.status_code == 200
+    assert 'ROUTED T2 again' in [assignment['content'] for assignment in response.json['data']]
+    assert counts['read'] == 0
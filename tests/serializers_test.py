@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+
+from flask import json
+
+from core.apis.assignments.schema import AssignmentSchema, assignment_serializer
+from core.apis.teachers.schema import TeacherSchema, teacher_serializer
+from core.models.assignments import Assignment, AssignmentStateEnum, GradeEnum
+from core.models.teachers import Teacher
+from tests import app
+
+
+def encode(data):
+    # same encoder settings as jsonify
+    with app.app_context():
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def test_assignment_serializer_parity():
+    assignments = Assignment.query.all() + [
+        Assignment(id=None),
+        Assignment(
+            id=10, student_id=1, teacher_id=2, content='ü content', grade=GradeEnum.B,
+            state=AssignmentStateEnum.GRADED,
+            created_at=datetime(2021, 1, 1, tzinfo=timezone.utc), updated_at=datetime(2021, 1, 2, 3, 4, 5, 6)
+        ),
+    ]
+
+    expected = AssignmentSchema().dump(assignments, many=True)
+    assert encode(assignment_serializer.dump(assignments, many=True)) == encode(expected)
+    for assignment in assignments:
+        assert encode(assignment_serializer.dump(assignment)) == encode(AssignmentSchema().dump(assignment))
+
+
+def test_teacher_serializer_parity():
+    teachers = Teacher.query.all() + [Teacher(id=None), Teacher(id=7, user_id=3, created_at=datetime(2021, 1, 1))]
+
+    expected = TeacherSchema().dump(teachers, many=True)
+    assert encode(teacher_serializer.dump(teachers, many=True)) == encode(expected)
@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+from core import create_app, db
+from core.config import Config
+
+# imported by the views or the CLI only, see core/libs/lazy.py
+DEFERRED_MODULES = ['alembic', 'flask_migrate', 'marshmallow', 'marshmallow_sqlalchemy', 'core.apis.assignments', 'core.commands']
+
+
+class MemoryConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+def test_import_defers_the_views():
+    script = 'import json, sys; from core.server import app; print(json.dumps([m for m in {0!r} if m in sys.modules]))'
+    output = subprocess.run(
+        [sys.executable, '-c', script.format(DEFERRED_MODULES)], check=True, capture_output=True, text=True
+    ).stdout
+
+    assert json.loads(output.splitlines()[-1]) == []
+
+
+def test_create_app_leaves_the_default_app_alone():
+    script = (
+        'import json, sys; from core import create_app, db; from core.config import Config; '
+        'app = create_app(type("MemoryConfig", (Config,), {"SQLALCHEMY_DATABASE_URI": "sqlite://"})); '
+        'print(json.dumps(["core.server" in sys.modules, db.app is None]))'
+    )
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+
+    assert json.loads(output.splitlines()[-1]) == [False, True]
+
+
+def test_create_app_registers_the_blueprints_on_first_request():
+    app = create_app(MemoryConfig)
+    assert 'student_assignments_resources.list_assignments' not in app.view_functions
+
+    response = app.test_client().get('/')
+
+    assert response.status_code == 200
+    assert 'student_assignments_resources.list_assignments' in app.view_functions
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite://'
+    with app.app_context():
+        assert db.engine.url.database is None
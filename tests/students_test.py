@@ -1,5 +1,12 @@
+import threading
+import pytest
+from tests import app
+from core import db
+from core.models.assignments import Assignment
+from core.models.grade_stats import GradeStat
 from core.models.students import Student
 
+@pytest.mark.max_queries(2)
 def test_get_assignments_student_1(client, h_student_1):
     response = client.get(
         '/student/assignments',
@@ -13,6 +20,7 @@ def test_get_assignments_student_1(client, h_student_1):
         assert assignment['student_id'] == 1
 
 
+@pytest.mark.max_queries(2)
 def test_get_assignments_student_2(client, h_student_2):
     response = client.get(
         '/student/assignments',
@@ -26,6 +34,7 @@ def test_get_assignments_student_2(client, h_student_2):
         assert assignment['student_id'] == 2
 
 
+@pytest.mark.max_queries(0)
 def test_post_assignment_null_content(client, h_student_1):
     """
     failure case: content cannot be null
@@ -41,6 +50,7 @@ def test_post_assignment_null_content(client, h_student_1):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(3)
 def test_post_assignment_student_1(client, h_student_1):
     content = 'ABCD TESTPOST'
 
@@ -59,6 +69,65 @@ def test_post_assignment_student_1(client, h_student_1):
     assert data['teacher_id'] is None
 
 
+@pytest.mark.max_queries(2)
+def test_edit_assignment_versions(client, h_student_1):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'VERSION T1'}).json['data']
+    assert draft['version'] == 1
+
+    response = client.post(
+        '/student/assignments',
+        headers=h_student_1,
+        json={
+            'id': draft['id'],
+            'content': 'VERSION T1 edited',
+            'version': 1
+        })
+
+    assert response.status_code == 200
+    assert response.json['data']['version'] == 2
+    assert response.headers['ETag'] == '"2"'
+
+    # a second tab still holding version 1
+    response = client.post(
+        '/student/assignments',
+        headers={**h_student_1, 'If-Match': '"1"'},
+        json={
+            'id': draft['id'],
+            'content': 'VERSION T1 stale'
+        })
+
+    assert response.status_code == 409
+    assert response.json['error'] == 'FyleError'
+    assert response.json['message'] == 'assignment was changed by another request, the current version is 2'
+
+    response = client.post(
+        '/student/assignments',
+        headers={**h_student_1, 'If-Match': '"2"'},
+        json={
+            'id': draft['id'],
+            'content': 'VERSION T1 edited again'
+        })
+
+    assert response.status_code == 200
+    assert response.json['data']['content'] == 'VERSION T1 edited again'
+    assert response.json['data']['version'] == 3
+
+
+@pytest.mark.max_queries(2)
+def test_edit_assignment_of_other_student(client, h_student_2):
+    response = client.post(
+        '/student/assignments',
+        headers=h_student_2,
+        json={
+            'id': 5,
+            'content': 'not mine'
+        })
+
+    assert response.status_code == 400
+    assert response.json['message'] == 'This assignment belongs to some other student'
+
+
+@pytest.mark.max_queries(5)
 def test_submit_assignment_student_1(client, h_student_1):
     response = client.post(
         '/student/assignments/submit',
@@ -76,6 +145,7 @@ def test_submit_assignment_student_1(client, h_student_1):
     assert data['teacher_id'] == 2
 
 
+@pytest.mark.max_queries(3)
 def test_assignment_resubmit_error(client, h_student_1):
     response = client.post(
         '/student/assignments/submit',
@@ -89,6 +159,113 @@ def test_assignment_resubmit_error(client, h_student_1):
     assert error_response['error'] == 'FyleError'
     assert error_response["message"] == 'only a draft assignment can be submitted'
 
+def test_concurrent_submits_apply_once(client, h_student_1):
+    draft = client.post('/student/assignments', headers=h_student_1, json={'content': 'RACE T1'}).json['data']
+
+    barrier = threading.Barrier(2)
+    responses = []
+
+    def submit():
+        barrier.wait()
+        responses.append(app.test_client().post(
+            '/student/assignments/submit',
+            headers=h_student_1,
+            json={'id': draft['id'], 'teacher_id': 1}
+        ))
+
+    threads = [threading.Thread(target=submit) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(response.status_code for response in responses) == [200, 400]
+    assert [response.json['message'] for response in responses if response.status_code == 400] == [
+        'only a draft assignment can be submitted'
+    ]
+
+@pytest.mark.max_queries(6)
+def test_submit_assignments_bulk(client, h_student_1):
+    response = client.post(
+        '/student/assignments',
+        headers=h_student_1,
+        json={'content': 'BULK SUBMIT'})
+    assignment_id = response.json['data']['id']
+
+    response = client.post(
+        '/student/assignments/submit/bulk',
+        headers=h_student_1,
+        json=[
+            {'id': assignment_id, 'teacher_id': 1},
+            {'id': 3, 'teacher_id': 1},
+            {'id': 100000, 'teacher_id': 1},
+            {'id': 2, 'teacher_id': 1},
+            {'id': assignment_id, 'teacher_id': 2},
+        ])
+
+    assert response.status_code == 200
+    results = response.json['data']
+
+    assert [result['status_code'] for result in results] == [200, 400, 404, 400, 400]
+    assert results[0]['data']['state'] == 'SUBMITTED'
+    assert results[0]['data']['teacher_id'] == 1
+    assert results[1]['message'] == 'This assignment belongs to some other student'
+    assert results[3]['message'] == 'only a draft assignment can be submitted'
+
+
+@pytest.mark.max_queries(3)
+def test_submit_assignments_bulk_unknown_teacher(client, h_student_1):
+    response = client.post(
+        '/student/assignments',
+        headers=h_student_1,
+        json={'content': 'BULK SUBMIT UNKNOWN TEACHER'})
+    assignment_id = response.json['data']['id']
+
+    response = client.post(
+        '/student/assignments/submit/bulk',
+        headers=h_student_1,
+        json=[{'id': assignment_id, 'teacher_id': 100000}])
+
+    assert response.status_code == 200
+    assert response.json['data'][0]['status_code'] == 400
+    assert response.json['data'][0]['message'] == 'No teacher with this id was found'
+
+
+def test_submit_assignments_bulk_concurrent_submit(client, h_student_1, monkeypatch):
+    response = client.post(
+        '/student/assignments',
+        headers=h_student_1,
+        json={'content': 'BULK SUBMIT RACE'})
+    assignment_id = response.json['data']['id']
+
+    check_batch = Assignment._check_batch.__func__
+
+    # another request submits the draft to teacher 2 between the check and the UPDATE of the bulk submit
+    def check_then_submit(cls, *args):
+        checked = check_batch(cls, *args)
+        with app.test_client() as other:
+            other_response = other.post(
+                '/student/assignments/submit', headers=h_student_1, json={'id': assignment_id, 'teacher_id': 2}
+            )
+        assert other_response.status_code == 200
+        return checked
+
+    monkeypatch.setattr(Assignment, '_check_batch', classmethod(check_then_submit))
+
+    response = client.post(
+        '/student/assignments/submit/bulk',
+        headers=h_student_1,
+        json=[{'id': assignment_id, 'teacher_id': 1}])
+
+    assert response.status_code == 200
+    assert response.json['data'][0]['status_code'] == 409
+    assert response.json['data'][0]['message'] == 'assignment was changed by another request'
+    assert Assignment.get_by_id(assignment_id).teacher_id == 2
+    # counted once, by the concurrent submit
+    with app.app_context():
+        assert GradeStat.diff(db.session.connection()) == []
+
+
 # model repr 
 def test_student_repr():
     student = Student(id=1)
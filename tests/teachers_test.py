@@ -1,4 +1,5 @@
 from core.models.assignments import AssignmentStateEnum, GradeEnum, Assignment
+from core.models.grade_stats import GradeStat
 from core.models.teachers import Teacher
 from core.apis.teachers.schema import TeacherSchema
 import pytest
@@ -10,6 +11,7 @@ from core.__init__ import app
 from werkzeug.exceptions import BadRequest, NotFound
 from core.libs.exceptions import FyleError
 
+@pytest.mark.max_queries(2)
 def test_get_assignments_teacher_1(client, h_teacher_1):
     response = client.get(
         '/teacher/assignments',
@@ -22,6 +24,7 @@ def test_get_assignments_teacher_1(client, h_teacher_1):
         assert assignment['teacher_id'] == 1
 
 
+@pytest.mark.max_queries(2)
 def test_get_assignments_teacher_2(client, h_teacher_2):
     response = client.get(
 
@@ -37,6 +40,7 @@ def test_get_assignments_teacher_2(client, h_teacher_2):
         assert assignment['state'] in ['SUBMITTED', 'GRADED']
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_cross(client, h_teacher_2):
     """
     failure case: assignment 1 was submitted to teacher 1 and not teacher 2
@@ -55,6 +59,7 @@ def test_grade_assignment_cross(client, h_teacher_2):
     assert data['error'] == 'FyleError'
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_bad_grade(client, h_teacher_1):
     """
     failure case: API should allow only grades available in enum
@@ -73,6 +78,7 @@ def test_grade_assignment_bad_grade(client, h_teacher_1):
     assert data['error'] == 'ValidationError'
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_bad_assignment(client, h_teacher_1):
     """
     failure case: If an assignment does not exists check and throw 404
@@ -91,6 +97,7 @@ def test_grade_assignment_bad_assignment(client, h_teacher_1):
     assert data['error'] == 'FyleError'
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_invalid_id(client, h_teacher_1):
     """
     failure case: If an assignment does not exists check and throw 404
@@ -109,6 +116,7 @@ def test_grade_assignment_invalid_id(client, h_teacher_1):
     assert data['error'] == 'FyleError'
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_draft_assignment(client, h_teacher_1):
     """
     failure case: only a submitted assignment can be graded
@@ -129,6 +137,7 @@ def test_grade_assignment_draft_assignment(client, h_teacher_1):
 
 # additional tests
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_missing_grade(client, h_teacher_2):
     """Test for missing fields in the grading payload."""
     # Missing 'grade' field
@@ -142,6 +151,7 @@ def test_grade_assignment_missing_grade(client, h_teacher_2):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_missing_id(client, h_teacher_2):
     # Missing 'id' field
     response = client.post(
@@ -154,6 +164,7 @@ def test_grade_assignment_missing_id(client, h_teacher_2):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_invalid_grade_value(client, h_teacher_1):
     """Test for grading an assignment with an invalid grade value."""
     response = client.post(
@@ -167,6 +178,7 @@ def test_grade_assignment_invalid_grade_value(client, h_teacher_1):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_invalid_id_value(client, h_teacher_2):
     """Test for grading an assignment with an invalid id value."""
     response = client.post(
@@ -180,6 +192,7 @@ def test_grade_assignment_invalid_id_value(client, h_teacher_2):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(0)
 def test_grade_unauthorized_method(client, h_teacher_2):
     """
     Test unauthorized method(post) to the assignments endpoint.
@@ -192,6 +205,7 @@ def test_grade_unauthorized_method(client, h_teacher_2):
     assert response.status_code == 405  
 
 
+@pytest.mark.max_queries(0)
 def test_list_assignments_unauthorized(client):
     """
     Test unauthorized access to the teachers endpoint.
@@ -201,6 +215,7 @@ def test_list_assignments_unauthorized(client):
     assert response.status_code == 401     
 
 
+@pytest.mark.max_queries(2)
 def test_get_assignments(client, h_teacher_1):
     response = client.get(
         '/teacher/assignments',
@@ -214,6 +229,7 @@ def test_get_assignments(client, h_teacher_1):
         assert assignment['state'] in [AssignmentStateEnum.DRAFT, AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED]
 
 
+@pytest.mark.max_queries(0)
 def test_grade_assignment_invalid_payload(client, h_teacher_1):
     """Test for invalid payloads"""
     response = client.post(
@@ -224,6 +240,7 @@ def test_grade_assignment_invalid_payload(client, h_teacher_1):
     assert response.status_code == 400
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_not_submit(client, h_teacher_2):
     """
     failure case: assignment 5 was submitted to none
@@ -243,6 +260,7 @@ def test_grade_assignment_not_submit(client, h_teacher_2):
     assert data['error'] == 'FyleError'
 
 
+@pytest.mark.max_queries(3)
 def test_grade_assignment_cross2(client, h_teacher_1):
     """
     failure case: assignment 3 was submitted to teacher 2 and not teacher 1
@@ -262,6 +280,7 @@ def test_grade_assignment_cross2(client, h_teacher_1):
     assert data['error'] == 'FyleError'
 
 
+@pytest.mark.max_queries(5)
 def test_grade_assignment_success(client, h_teacher_2):
     """
     success case: Successfully grade a submitted assignment.
@@ -283,6 +302,78 @@ def test_grade_assignment_success(client, h_teacher_2):
     assert data['grade'] == "B"
 
 
+@pytest.mark.max_queries(5)
+def test_grade_assignments_bulk(client, h_teacher_2):
+    """
+    bulk grading reports a result per item and grades the valid ones
+    """
+    response = client.post(
+        '/teacher/assignments/grade/bulk',
+        headers=h_teacher_2,
+        json=[
+            {"id": 4, "grade": "A"},
+            {"id": 1, "grade": "B"},
+            {"id": 100000, "grade": "A"},
+            {"id": 4, "grade": "C"},
+        ]
+    )
+
+    assert response.status_code == 200
+    results = response.json['data']
+
+    assert [result['id'] for result in results] == [4, 1, 100000, 4]
+    assert [result['status_code'] for result in results] == [200, 400, 404, 400]
+    assert results[0]['data']['grade'] == 'A'
+    assert results[0]['data']['state'] == 'GRADED'
+    assert results[1]['error'] == 'FyleError'
+    assert Assignment.get_by_id(4).grade == GradeEnum.A
+
+
+def test_grade_assignments_bulk_concurrent_regrade(client, h_teacher_2, monkeypatch):
+    check_batch = Assignment._check_batch.__func__
+
+    # another request regrades the assignment between the check and the UPDATE of the bulk grade
+    def check_then_grade(cls, *args):
+        checked = check_batch(cls, *args)
+        with app.test_client() as other:
+            other_response = other.post('/teacher/assignments/grade', headers=h_teacher_2, json={'id': 4, 'grade': 'B'})
+        assert other_response.status_code == 200
+        return checked
+
+    monkeypatch.setattr(Assignment, '_check_batch', classmethod(check_then_grade))
+
+    response = client.post(
+        '/teacher/assignments/grade/bulk',
+        headers=h_teacher_2,
+        json=[{"id": 4, "grade": "C"}]
+    )
+
+    assert response.status_code == 200
+    assert response.json['data'][0]['status_code'] == 409
+    assert response.json['data'][0]['message'] == 'assignment was changed by another request'
+    with app.app_context():
+        assert Assignment.get_by_id(4).grade == GradeEnum.B
+        assert GradeStat.diff(db.session.connection()) == []
+
+
+@pytest.mark.max_queries(0)
+def test_grade_assignments_bulk_invalid_payload(client, h_teacher_2):
+    response = client.post(
+        '/teacher/assignments/grade/bulk',
+        headers=h_teacher_2,
+        json=[{"id": 4, "grade": "AB"}]
+    )
+    assert response.status_code == 400
+    assert response.json['error'] == 'ValidationError'
+
+    response = client.post(
+        '/teacher/assignments/grade/bulk',
+        headers=h_teacher_2,
+        json=[]
+    )
+    assert response.status_code == 400
+
+
 # schema test
 def test_teacher_schema_load():
     """
@@ -309,6 +400,7 @@ def test_teacher_schema_load():
 
 #################### server tests ####################
 
+@pytest.mark.max_queries(0)
 def test_base_route(client):
     response = client.get('/')
 
@@ -373,6 +465,7 @@ def test_assignment_class_method(db_session):
     assert inserted_assignment.student_id == 1  
 
 
+@pytest.mark.max_queries(0)
 def test_http_exception_bad_request(client, h_teacher_1):
     # with app.test_client() as client:
        